@@ -42,6 +42,9 @@ class Reminders(db.Table):
     event = db.Column("event text")
     extra = db.Column("extra jsonb DEFAULT '{}'::jsonb")
 
+    task_reset_idx = db.Index("reminders_task_reset_idx", "(extra #>> '{args,1}')", where="event = 'task_reset'")
+    owner_expires_idx = db.Index("reminders_owner_expires_idx", "(extra #>> '{args,0}'), expires, id", where="event = 'reminder'")
+
 
 class PaginatorSource(menus.ListPageSource):
     def __init__(self, entries: list[asyncpg.Record], *, per_page: int = 10, title: str = "Reminders"):
@@ -161,16 +164,25 @@ class Reminder(commands.Cog):
     def __init__(self, bot: AutoShardedBot):
         self.bot: AutoShardedBot = bot
         self._have_data = asyncio.Event()
+        self._caught_up = asyncio.Event()
         self._current_timer: Optional[Timer] = None
+        self._task: Optional[asyncio.Task[None]] = None
 
     def __repr__(self) -> str:
         return f"<cogs.{self.__cog_name__}>"
 
     async def cog_load(self) -> None:
-        self._task = self.bot.loop.create_task(self.dispatch_timers())
+        self.restart_dispatcher()
 
     async def cog_unload(self) -> None:
-        self._task.cancel()
+        if self._task is not None:
+            self._task.cancel()
+
+    def restart_dispatcher(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        self._task = self.bot.loop.create_task(self.dispatch_timers())
+        self.bot.task_registry.register("reminder.dispatch_timers", self._task)
 
     async def cog_command_error(self, ctx: Context, error: commands.CommandError):
         if isinstance(error, commands.TooManyArguments):
@@ -203,9 +215,14 @@ class Reminder(commands.Cog):
 
             self._have_data.clear()
             self._current_timer = None
+            self._caught_up.set()
             await self._have_data.wait()
             return await self.get_active_timer(connection=con, days=days)  # type: ignore
 
+    async def wait_until_caught_up(self) -> None:
+        """Waits until every timer that was already due when the dispatcher started has been dispatched."""
+        await self._caught_up.wait()
+
     async def call_timer(self, timer: Timer) -> None:
         await self.bot.pool.execute("DELETE FROM reminders WHERE id=$1;", timer.id)
 
@@ -218,15 +235,17 @@ class Reminder(commands.Cog):
                 now: NDT = datetime.datetime.utcnow()  # type: ignore
 
                 if timer.expires >= now:
+                    self._caught_up.set()
                     to_sleep = (timer.expires - now).total_seconds()
                     await asyncio.sleep(to_sleep)
                 await self.call_timer(timer)
+                self.bot.task_registry.tick("reminder.dispatch_timers")
                 await asyncio.sleep(0.1)
         except asyncio.CancelledError as e:
             raise e
-        except (OSError, discord.ConnectionClosed, asyncpg.PostgresConnectionError):
-            self._task.cancel()
-            self._task = self.bot.loop.create_task(self.dispatch_timers())
+        except (OSError, discord.ConnectionClosed, asyncpg.PostgresConnectionError) as e:
+            self.bot.task_registry.fail("reminder.dispatch_timers", e)
+            self.restart_dispatcher()
 
     async def short_timer_optimisation(self, seconds: float, timer: Timer) -> None:
         await asyncio.sleep(seconds)
@@ -263,14 +282,17 @@ class Reminder(commands.Cog):
         log.debug(f"PostgreSQL Query: \"{query}\" + {event, {'args': args, 'kwargs': kwargs}, when_to, now}")
         timer.id = row[0]
 
-        if delta <= (86400 * 40):  # 40 days
+        self.reschedule(when_to, now=now)
+        return timer
+
+    def reschedule(self, expires: NDT, *, now: Optional[NDT] = None) -> None:
+        """Wakes up the dispatcher for timers that were inserted outside of :meth:`create_timer`."""
+        now = now or datetime.datetime.utcnow()  # type: ignore
+        if (expires - now).total_seconds() <= (86400 * 40):  # 40 days
             self._have_data.set()
 
-        if self._current_timer and when_to < self._current_timer.expires:
-            self._task.cancel()
-            self._task = self.bot.loop.create_task(self.dispatch_timers())
-
-        return timer
+        if self._current_timer and expires < self._current_timer.expires:
+            self.restart_dispatcher()
 
     @commands.hybrid_group("reminder", fallback="set", aliases=["timer", "remind"], extras={"examples": ["20m go buy food", "do something in 20m", "jan 1st happy new years"]}, usage="<when> <message>", invoke_without_command=True)
     async def reminder(self, ctx: Context, *, when: Annotated[time.FriendlyTimeResult, time.UserFriendlyTime(commands.clean_content, default="...")], reminder: str = None):
@@ -314,8 +336,7 @@ class Reminder(commands.Cog):
             return await ctx.send(ctx.lang["reminder"]["delete"]["missing"], ephemeral=True)
 
         if self._current_timer and self._current_timer.id == reminder.id:
-            self._task.cancel()
-            self._task = self.bot.loop.create_task(self.dispatch_timers())
+            self.restart_dispatcher()
         self.get_records.invalidate(self, ctx.author.id)
 
         await ctx.send(ctx.lang["reminder"]["delete"]["deleted"])
@@ -342,8 +363,7 @@ class Reminder(commands.Cog):
         await ctx.db.execute(query, author_id)
 
         if self._current_timer and self._current_timer.author_id == ctx.author.id:
-            self._task.cancel()
-            self._task = self.bot.loop.create_task(self.dispatch_timers())
+            self.restart_dispatcher()
         self.get_records.invalidate(self, ctx.author.id)
 
         await ctx.send(ctx.lang["reminder"]["clear"]["success"].format(f"{time.plural(total):reminder}"))
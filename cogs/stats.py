@@ -12,15 +12,19 @@ from __future__ import annotations
 import asyncio
 import datetime
 import gc
+import gzip
 import io
 import logging
+import math
 import os
 import re
 import sys
+import tempfile
 import textwrap
 import traceback
 from collections import Counter
-from typing import TYPE_CHECKING, Any, Optional, TypedDict
+from typing import (IO, TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Literal,
+                    Optional, Sequence)
 
 import asyncpg
 import discord
@@ -28,30 +32,24 @@ import psutil
 from discord.ext import commands, tasks
 from typing_extensions import Annotated
 from utils import time
-from utils.db import Column, Table
+from utils.formats import sparkline
+from utils.db import Column, Index, Table
+from utils.errors import fingerprint
+from utils.rolling import RollingCounter
+from utils.sketch import TopKWindows
 from utils.context import Context
 
 if TYPE_CHECKING:
 
     from index import AutoShardedBot
 
-    class DataCommandsBatchEntry(TypedDict):
-        guild: Optional[int]
-        channel: int
-        author: int
-        used: str
-        prefix: str
-        command: str
-        failed: bool
-
-    class DataJoinsBatchEntry(TypedDict):
-        guild: int
-        time: str
-        joined: Optional[bool]
-        current_count: int
 
 log = logging.getLogger(__name__)
 
+TABULATE_SAMPLE_SIZE = 100
+TABULATE_SPOOL_SIZE = 1024 * 1024
+TABULATE_MAX_SIZE = 8 * 1024 * 1024
+
 
 class GatewayHandler(logging.Handler):
     def __init__(self, cog: Stats):
@@ -68,15 +66,154 @@ class GatewayHandler(logging.Handler):
         self.cog.add_record(record)
 
 
-class Commands(Table):
-    id = Column("id bigint PRIMARY KEY GENERATED ALWAYS AS IDENTITY")
+class ShardMetrics(Table):
+    # 'minute' rows are kept for a day, 'hour' rows for a month and 'day' rows forever
+    resolution = Column("resolution text NOT NULL")
+    bucket = Column("bucket TIMESTAMP NOT NULL")
+    shard_id = Column("shard_id integer NOT NULL")
+    latency_sum = Column("latency_sum double precision NOT NULL DEFAULT 0")
+    samples = Column("samples integer NOT NULL DEFAULT 0")
+    guild_count = Column("guild_count bigint NOT NULL DEFAULT 0")
+    primary_key = Column("PRIMARY KEY (resolution, shard_id, bucket)")
+    bucket_idx = Index("shardmetrics_resolution_bucket_idx", "resolution, bucket")
+
+
+# resolution: (points shown, bucket width)
+SHARD_HISTORY = {
+    "minute": (60, datetime.timedelta(minutes=1)),
+    "hour": (48, datetime.timedelta(hours=1)),
+    "day": (30, datetime.timedelta(days=1)),
+}
+
+
+class GatewayDigest:
+    """Collects gateway log records between webhook sends.
+
+    Repeated messages are counted instead of queued again, and once
+    ``max_size`` distinct messages are pending new ones are dropped."""
+
+    EMOJI = {
+        "INFO": "\N{INFORMATION SOURCE}",
+        "WARNING": "\N{WARNING SIGN}",
+    }
+
+    def __init__(self, *, max_size: int = 500, message_size: int = 2000):
+        self.max_size: int = max_size
+        self.message_size: int = message_size
+        self.pending: dict[tuple[str, str], list[Any]] = {}
+        self.dropped: int = 0
+        self._dropped_since: int = 0
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def add(self, record: logging.LogRecord) -> None:
+        key = (record.levelname, record.getMessage())
+        entry = self.pending.get(key)
+        if entry is not None:
+            entry[1] += 1
+        elif len(self.pending) >= self.max_size:
+            self.dropped += 1
+            self._dropped_since += 1
+        else:
+            self.pending[key] = [record.created, 1]
+
+    def drain(self) -> list[str]:
+        """Empties the pending records into messages of at most ``message_size`` characters."""
+        lines = []
+        for (level, message), (created, count) in self.pending.items():
+            emoji = self.EMOJI.get(level, "\N{CROSS MARK}")
+            dt = datetime.datetime.utcfromtimestamp(created)
+            suffix = f" (x{count})" if count > 1 else ""
+            line = f"{emoji} [{time.format_dt(dt)}] `{message}`{suffix}"
+            lines.append(textwrap.shorten(line, width=self.message_size - 10))
+        if self._dropped_since:
+            lines.append(f"\N{WARNING SIGN} {self._dropped_since} gateway records dropped")
+        self.pending.clear()
+        self._dropped_since = 0
+
+        digests, current = [], ""
+        for line in lines:
+            if current and len(current) + len(line) + 1 > self.message_size:
+                digests.append(current)
+                current = ""
+            current = f"{current}\n{line}" if current else line
+        if current:
+            digests.append(current)
+        return digests
+
+
+class Commands(Table, partition_by="RANGE (used)"):
+    # partitioned tables can't have identity columns before Postgres 17
+    id = Column("id bigserial")
     guild_id = Column("guild_id bigint")
     channel_id = Column("channel_id bigint NOT NULL")
     author_id = Column("author_id bigint NOT NULL")
-    used = Column("used TIMESTAMP")
+    used = Column("used TIMESTAMP NOT NULL")
     prefix = Column("prefix text")
     command = Column("command text")
     failed = Column("failed boolean")
+    queries = Column("queries integer")
+    query_rows = Column("query_rows bigint")
+    query_time = Column("query_time double precision")
+    primary_key = Column("PRIMARY KEY (id, used)")
+    guild_used_idx = Index("commands_guild_id_used_idx", "guild_id, used")
+    author_used_idx = Index("commands_author_id_used_idx", "author_id, used")
+
+    @classmethod
+    def create_table(cls, *, exists_ok=True) -> str:
+        statement = super().create_table(exists_ok=exists_ok)
+        # added after the table was first created
+        return statement + """
+ALTER TABLE commands ADD COLUMN IF NOT EXISTS queries integer;
+ALTER TABLE commands ADD COLUMN IF NOT EXISTS query_rows bigint;
+ALTER TABLE commands ADD COLUMN IF NOT EXISTS query_time double precision;"""
+
+
+# name: (query, unique index columns needed to refresh concurrently)
+MATERIALIZED_VIEWS = {
+    "commandhistory_daily": (
+        """SELECT used::date AS "day",
+                  command,
+                  COALESCE(guild_id, 0) AS "guild_id",
+                  SUM(CASE WHEN failed THEN 0 ELSE 1 END) AS "success",
+                  SUM(CASE WHEN failed THEN 1 ELSE 0 END) AS "failed"
+           FROM commands
+           WHERE command IS NOT NULL
+           GROUP BY 1, 2, 3""",
+        "day, command, guild_id",
+    ),
+    "commandactivity_hourly": (
+        """SELECT extract(hour from used)::int AS "hour",
+                  SUM(CASE WHEN failed THEN 0 ELSE 1 END) AS "success"
+           FROM commands
+           GROUP BY 1""",
+        "hour",
+    ),
+}
+
+
+def create_materialized_views() -> str:
+    statements = []
+    for name, (query, unique) in MATERIALIZED_VIEWS.items():
+        statements.append(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {name} AS {query};")
+        statements.append(f"CREATE UNIQUE INDEX IF NOT EXISTS {name}_uniq_idx ON {name} ({unique});")
+        statements.append(
+            f"INSERT INTO view_refreshes (name, refreshed_at) VALUES ('{name}', (now() at time zone 'utc')) "
+            "ON CONFLICT (name) DO NOTHING;"
+        )
+    return "\n".join(statements)
+
+
+class ViewRefreshes(Table, table_name="view_refreshes"):
+    # kept out of the views so a concurrent refresh only rewrites the rows that changed
+    name = Column("name text PRIMARY KEY")
+    refreshed_at = Column("refreshed_at TIMESTAMP NOT NULL")
+
+    @classmethod
+    def create_table(cls, *, exists_ok=True) -> str:
+        # created here rather than on first refresh so the reports work straight after --init
+        return super().create_table(exists_ok=exists_ok) + "\n" + create_materialized_views()
 
 
 class Joined(Table):
@@ -86,6 +223,188 @@ class Joined(Table):
     current_count = Column("current_count bigint DEFAULT NULL")
 
 
+class CommandsHourly(Table, table_name="commands_hourly"):
+    hour = Column("hour TIMESTAMP NOT NULL")
+    command = Column("command text NOT NULL")
+    failed = Column("failed boolean NOT NULL")
+    uses = Column("uses bigint NOT NULL DEFAULT 0")
+    primary_key = Column("PRIMARY KEY (hour, command, failed)")
+
+
+class CommandGuildsHourly(Table, table_name="command_guilds_hourly"):
+    hour = Column("hour TIMESTAMP NOT NULL")
+    # 0 for commands used in private messages
+    guild_id = Column("guild_id bigint NOT NULL")
+    uses = Column("uses bigint NOT NULL DEFAULT 0")
+    primary_key = Column("PRIMARY KEY (hour, guild_id)")
+
+
+class CommandAuthorsHourly(Table, table_name="command_authors_hourly"):
+    hour = Column("hour TIMESTAMP NOT NULL")
+    author_id = Column("author_id bigint NOT NULL")
+    uses = Column("uses bigint NOT NULL DEFAULT 0")
+    primary_key = Column("PRIMARY KEY (hour, author_id)")
+
+
+class TelemetryBuffer:
+    """A bounded buffer of rows that are flushed into a table with ``COPY``.
+
+    Rows are dropped and counted once the buffer is full, e.g. while the
+    database is unreachable, instead of growing without a limit.
+
+    ``rollup`` is awaited with the connection and the batch in the same
+    transaction as the ``COPY`` so aggregates never drift from the raw rows."""
+
+    def __init__(
+        self,
+        table: str,
+        columns: Sequence[str],
+        *,
+        flush_size: int = 500,
+        max_size: int = 10000,
+        rollup: Optional[Callable[[asyncpg.Connection, list[tuple[Any, ...]]], Awaitable[None]]] = None,
+    ):
+        self.table: str = table
+        self.columns: Sequence[str] = columns
+        self.rollup = rollup
+        self.flush_size: int = flush_size
+        self.max_size: int = max_size
+        self.rows: list[tuple[Any, ...]] = []
+        self.dropped: int = 0
+        self.lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __repr__(self) -> str:
+        return f"<TelemetryBuffer table={self.table} rows={len(self.rows)} dropped={self.dropped}>"
+
+    def add(self, row: tuple[Any, ...]) -> bool:
+        """Adds a row, returns ``True`` when the buffer should be flushed."""
+        if len(self.rows) >= self.max_size:
+            self.dropped += 1
+            return False
+        self.rows.append(row)
+        return len(self.rows) >= self.flush_size
+
+    async def flush(self, pool: asyncpg.Pool) -> int:
+        async with self.lock:
+            if not self.rows:
+                return 0
+
+            batch, self.rows = self.rows, []
+            try:
+                if self.rollup is None:
+                    await pool.copy_records_to_table(self.table, records=batch, columns=self.columns)
+                else:
+                    async with pool.acquire() as con:
+                        async with con.transaction():
+                            await con.copy_records_to_table(self.table, records=batch, columns=self.columns)
+                            await self.rollup(con, batch)
+            except BaseException:
+                # keep what still fits for the next attempt
+                rows = batch + self.rows
+                self.dropped += max(0, len(rows) - self.max_size)
+                self.rows = rows[:self.max_size]
+                raise
+            return len(batch)
+
+
+def aggregate_hourly(rows: Sequence[tuple[Any, ...]]) -> tuple[Counter, Counter, Counter]:
+    """Counts a batch of ``commands`` rows per hour by command, guild and author."""
+    commands, guilds, authors = Counter(), Counter(), Counter()
+    for guild_id, _, author_id, used, _, command, failed, *_ in rows:
+        hour = used.replace(minute=0, second=0, microsecond=0)
+        commands[hour, command, bool(failed)] += 1
+        guilds[hour, guild_id or 0] += 1
+        authors[hour, author_id] += 1
+    return commands, guilds, authors
+
+
+async def rollup_commands(con: asyncpg.Connection, rows: Sequence[tuple[Any, ...]]) -> None:
+    commands, guilds, authors = aggregate_hourly(rows)
+
+    query = """INSERT INTO commands_hourly AS h (hour, command, failed, uses)
+               SELECT * FROM unnest($1::timestamp[], $2::text[], $3::boolean[], $4::bigint[])
+               ON CONFLICT (hour, command, failed) DO UPDATE SET uses = h.uses + EXCLUDED.uses;
+            """
+    await con.execute(query, *zip(*((h, c, f, n) for (h, c, f), n in commands.items())))
+
+    query = """INSERT INTO command_guilds_hourly AS h (hour, guild_id, uses)
+               SELECT * FROM unnest($1::timestamp[], $2::bigint[], $3::bigint[])
+               ON CONFLICT (hour, guild_id) DO UPDATE SET uses = h.uses + EXCLUDED.uses;
+            """
+    await con.execute(query, *zip(*((h, g, n) for (h, g), n in guilds.items())))
+
+    query = """INSERT INTO command_authors_hourly AS h (hour, author_id, uses)
+               SELECT * FROM unnest($1::timestamp[], $2::bigint[], $3::bigint[])
+               ON CONFLICT (hour, author_id) DO UPDATE SET uses = h.uses + EXCLUDED.uses;
+            """
+    await con.execute(query, *zip(*((h, a, n) for (h, a), n in authors.items())))
+
+
+_PARTITION_REGEX = re.compile(r"^commands_(\d{4})_(\d{2})$")
+
+
+def add_months(dt: datetime.datetime, months: int) -> datetime.datetime:
+    """The start of the month ``months`` away from ``dt``."""
+    month = dt.month - 1 + months
+    return dt.replace(year=dt.year + month // 12, month=month % 12 + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def partition_name(month: datetime.datetime) -> str:
+    return f"commands_{month:%Y_%m}"
+
+
+def expired_partitions(names: Sequence[str], now: datetime.datetime, retention: int) -> list[str]:
+    """The monthly ``commands`` partitions that ended more than ``retention`` months ago, oldest first."""
+    cutoff = add_months(now, -retention)
+    expired = []
+    for name in sorted(names):
+        match = _PARTITION_REGEX.match(name)
+        if match is None:
+            continue
+        month = datetime.datetime(int(match[1]), int(match[2]), 1)
+        if add_months(month, 1) <= cutoff:
+            expired.append(name)
+    return expired
+
+
+# table: timestamp column used to select a date range
+EXPORT_TABLES = {
+    "commands": "used",
+    "joined": "time",
+}
+
+
+def iso_date(arg: str) -> datetime.datetime:
+    return datetime.datetime.strptime(arg, "%Y-%m-%d")
+
+
+async def export_tables(
+    con: asyncpg.Connection, directory: str, start: datetime.datetime, end: datetime.datetime, *, fmt: str = "csv"
+) -> list[str]:
+    """Streams the rows of each export table between ``start`` and ``end`` with ``COPY ... TO STDOUT``
+    into gzipped CSV or NDJSON files in ``directory``, returns the paths written."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for table, column in EXPORT_TABLES.items():
+        query = f"SELECT * FROM {table} WHERE {column} >= $1 AND {column} < $2 ORDER BY {column}"
+        if fmt == "ndjson":
+            # CSV with quote and delimiter characters that never appear, so the JSON is written untouched
+            query = f"SELECT row_to_json(t) FROM ({query}) t"
+            options: dict[str, Any] = dict(format="csv", quote="\x01", delimiter="\x02")
+        else:
+            options = dict(format="csv", header=True)
+
+        path = os.path.join(directory, f"{table}_{start:%Y%m%d}_{end:%Y%m%d}.{fmt}.gz")
+        with gzip.open(f"{path}.tmp", "wb") as fp:
+            await con.copy_from_query(query, start, end, output=fp, **options)
+        os.replace(f"{path}.tmp", path)
+        paths.append(path)
+    return paths
+
+
 class TabularData:
     def __init__(self):
         self._widths = []
@@ -139,6 +458,61 @@ class TabularData:
         return '\n'.join(to_draw)
 
 
+class StreamingTable:
+    """Renders rows in the same rST format as :class:`TabularData` one line at a time.
+
+    Column widths come from a sample of the rows and are capped at ``max_width``,
+    longer values are cut short."""
+
+    def __init__(self, columns: Sequence[str], sample: Sequence[Sequence[Any]], *, max_width: int = 40):
+        self.columns: list[str] = list(columns)
+        widths = [len(c) + 2 for c in self.columns]
+        for row in sample:
+            for index, element in enumerate(row):
+                widths[index] = max(widths[index], len(str(element)) + 2)
+        self.widths: list[int] = [min(w, max_width + 2) for w in widths]
+        self.separator: str = '+' + '+'.join('-' * w for w in self.widths) + '+'
+
+    def render_row(self, row: Sequence[Any]) -> str:
+        cells = []
+        for value, width in zip(row, self.widths):
+            value = str(value).replace('\n', '\\n')
+            if len(value) > width - 2:
+                value = value[:width - 3] + '\N{HORIZONTAL ELLIPSIS}'
+            cells.append(f'{value:^{width}}')
+        return '|' + '|'.join(cells) + '|'
+
+    def header(self) -> str:
+        return '\n'.join((self.separator, self.render_row(self.columns), self.separator))
+
+
+async def stream_table(
+    fp: IO[bytes], columns: Sequence[str], sample: Sequence[Sequence[Any]], rows: AsyncIterator[Sequence[Any]], *, max_bytes: int
+) -> tuple[int, bool]:
+    """Writes the sample and then the remaining rows as a table into ``fp``.
+
+    Returns the number of rows written and whether the output was cut off at ``max_bytes``."""
+    table = StreamingTable(columns, sample)
+    written = fp.write(f'{table.header()}\n'.encode('utf-8'))
+    lines = [table.render_row(row) for row in sample]
+    total, truncated = len(sample), False
+
+    async for row in rows:
+        lines.append(table.render_row(row))
+        total += 1
+        if len(lines) >= 500:
+            written += fp.write(('\n'.join(lines) + '\n').encode('utf-8'))
+            lines = []
+            if written >= max_bytes:
+                truncated = True
+                break
+
+    if lines:
+        fp.write(('\n'.join(lines) + '\n').encode('utf-8'))
+    fp.write(table.separator.encode('utf-8'))
+    return total, truncated
+
+
 _INVITE_REGEX = re.compile(r'(?:https?:\/\/)?discord(?:\.gg|\.com|app\.com\/invite)?\/[A-Za-z0-9]+')
 
 
@@ -161,14 +535,39 @@ class Stats(commands.Cog, command_attrs=dict(hidden=True)):
     def __init__(self, bot: AutoShardedBot):
         self.bot: AutoShardedBot = bot
         self.process = psutil.Process()
-        self._batch_commands_lock, self._batch_joins_lock = asyncio.Lock(loop=bot.loop), asyncio.Lock(loop=bot.loop)
-        self._data_commands_batch: list[DataCommandsBatchEntry] = []
-        self._data_joins_batch: list[DataJoinsBatchEntry] = []
+        flush_size = getattr(bot.config, "stats_flush_size", 500)
+        max_size = getattr(bot.config, "stats_buffer_size", 10000)
+        self._commands_buffer = TelemetryBuffer(
+            "commands",
+            ("guild_id", "channel_id", "author_id", "used", "prefix", "command", "failed", "queries", "query_rows", "query_time"),
+            flush_size=flush_size,
+            max_size=max_size,
+            rollup=rollup_commands,
+        )
+        self._joins_buffer = TelemetryBuffer(
+            "joined",
+            ("guild_id", "joined", "current_count", "time"),
+            flush_size=flush_size,
+            max_size=max_size,
+        )
+        capacity = getattr(bot.config, "stats_sketch_size", 100)
+        self.top_commands: TopKWindows[str] = TopKWindows(capacity=capacity)
+        self.top_guilds: TopKWindows[int] = TopKWindows(capacity=capacity)
+        self.top_authors: TopKWindows[int] = TopKWindows(capacity=capacity)
+        self.interaction_stats: Counter[str] = Counter()
+        self.retention_months: int = getattr(bot.config, "stats_retention_months", 12)
+        self.archive_dir: str = getattr(bot.config, "stats_archive_dir", "archive")
+        self._metrics_pruned_at: Optional[datetime.datetime] = None
         self.bulk_insert_commands_loop.add_exception_type(asyncpg.PostgresConnectionError)
+        self.partition_commands_loop.add_exception_type(asyncpg.PostgresConnectionError)
+        self.refresh_views_loop.add_exception_type(asyncpg.PostgresConnectionError)
+        self.refresh_views_loop.change_interval(minutes=getattr(bot.config, "stats_refresh_minutes", 15.0))
 
         self.bulk_insert_joins_loop.add_exception_type(asyncpg.PostgresConnectionError)
 
-        self._gateway_queue = asyncio.Queue()
+        self._gateway_digest = GatewayDigest(max_size=getattr(bot.config, "gateway_digest_size", 500))
+        self.gateway_worker.add_exception_type(discord.HTTPException)
+        self.gateway_worker.change_interval(seconds=getattr(bot.config, "gateway_digest_window", 5.0))
 
     def __repr__(self) -> str:
         return f"<cogs.{self.__cog_name__}>"
@@ -182,55 +581,179 @@ class Stats(commands.Cog, command_attrs=dict(hidden=True)):
         return True
 
     async def bulk_insert_commands(self):
-        query = """INSERT INTO commands (guild_id, channel_id, author_id, used, prefix, command, failed)
-               SELECT x.guild, x.channel, x.author, x.used, x.prefix, x.command, x.failed
-               FROM jsonb_to_recordset($1::jsonb) AS
-               x(guild BIGINT, channel BIGINT, author BIGINT, used TIMESTAMP, prefix TEXT, command TEXT, failed BOOLEAN)"""
-
-        if self._data_commands_batch:
-            await self.bot.pool.execute(query, self._data_commands_batch)
-            total = len(self._data_commands_batch)
-            if total > 1:
-                log.info(f"Inserted {total} commands into the database")
-            self._data_commands_batch.clear()
+        total = await self._commands_buffer.flush(self.bot.pool)
+        if total > 1:
+            log.info(f"Inserted {total} commands into the database")
 
     async def bulk_insert_joins(self):
-        query = """INSERT INTO joined (guild_id, joined, current_count, time)
-               SELECT x.guild, x.joined, x.current_count, x.time
-               FROM jsonb_to_recordset($1::jsonb) AS
-               x(guild BIGINT, joined BOOLEAN, current_count BIGINT, time TIMESTAMP)"""
-
-        if self._data_joins_batch:
-            await self.bot.pool.execute(query, self._data_joins_batch)
-            total = len(self._data_joins_batch)
-            if total > 1:
-                log.info(f"Inserted {total} guild counts into the database")
-            self._data_joins_batch.clear()
+        total = await self._joins_buffer.flush(self.bot.pool)
+        if total > 1:
+            log.info(f"Inserted {total} guild counts into the database")
+
+    async def _flush_early(self, buffer: TelemetryBuffer) -> None:
+        if buffer.lock.locked():
+            return
+        try:
+            await buffer.flush(self.bot.pool)
+        except (OSError, asyncpg.PostgresError) as e:
+            log.error(f"Failed to flush {len(buffer)} rows into {buffer.table}", exc_info=e)
+
+    async def commands_partitioned(self, con: asyncpg.Connection) -> bool:
+        query = """SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('commands');"""
+        return bool(await con.fetchval(query))
+
+    async def create_command_partitions(self, con: asyncpg.Connection, *, since: datetime.datetime, ahead: int = 2) -> None:
+        """Creates the monthly partitions from ``since`` until ``ahead`` months from now, plus a default partition."""
+        now = discord.utils.utcnow().replace(tzinfo=None)
+        month, last = add_months(since, 0), add_months(now, ahead)
+        while month <= last:
+            end = add_months(month, 1)
+            await con.execute(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF commands "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{end:%Y-%m-%d}');"
+            )
+            month = end
+        await con.execute("CREATE TABLE IF NOT EXISTS commands_default PARTITION OF commands DEFAULT;")
+
+    async def archive_command_partitions(self, con: asyncpg.Connection) -> list[str]:
+        """Exports expired partitions to gzipped CSV files, then drops them.
+
+        The hourly rollups are kept, so ``commandstats`` still covers the archived months."""
+        query = """SELECT c.relname
+                   FROM pg_inherits i
+                   INNER JOIN pg_class c ON c.oid = i.inhrelid
+                   WHERE i.inhparent = 'commands'::regclass;
+                """
+        names = [r[0] for r in await con.fetch(query)]
+        now = discord.utils.utcnow().replace(tzinfo=None)
+        archived = []
+        for name in expired_partitions(names, now, self.retention_months):
+            os.makedirs(self.archive_dir, exist_ok=True)
+            path = os.path.join(self.archive_dir, f"{name}.csv.gz")
+            with gzip.open(f"{path}.tmp", "wb") as fp:
+                await con.copy_from_table(name, output=fp, format="csv", header=True)
+            os.replace(f"{path}.tmp", path)
+
+            async with con.transaction():
+                await con.execute(f"ALTER TABLE commands DETACH PARTITION {name};")
+                await con.execute(f"DROP TABLE {name};")
+            log.info(f"Archived {name} to {path}")
+            archived.append(name)
+        return archived
+
+    async def maintain_command_partitions(self) -> None:
+        async with self.bot.pool.acquire() as con:
+            if not await self.commands_partitioned(con):
+                log.warning("The commands table is not partitioned, run the commandstats partition command to migrate it")
+                return
+            await self.create_command_partitions(con, since=discord.utils.utcnow().replace(tzinfo=None))
+            await self.archive_command_partitions(con)
+
+    async def refresh_materialized_views(self) -> None:
+        query = """INSERT INTO view_refreshes (name, refreshed_at) VALUES ($1, (now() at time zone 'utc'))
+                   ON CONFLICT (name) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at;
+                """
+        async with self.bot.pool.acquire() as con:
+            for name in MATERIALIZED_VIEWS:
+                await con.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name};")
+                await con.execute(query, name)
+
+    async def view_freshness(self, view: str) -> str:
+        refreshed_at = await self.bot.pool.fetchval("SELECT refreshed_at FROM view_refreshes WHERE name = $1;", view)
+        if refreshed_at is None:
+            return "No data yet"
+        return f"Data as of {time.format_dt(refreshed_at, 'R')}"
 
     async def cog_load(self):
-        self.bulk_insert_commands_loop.start()
-        self.bulk_insert_joins_loop.start()
-        self.gateway_worker.start()
+        registry = self.bot.task_registry
+        registry.register("stats.partition_commands", self.partition_commands_loop.start())
+        registry.register("stats.bulk_insert_commands", self.bulk_insert_commands_loop.start())
+        registry.register("stats.bulk_insert_joins", self.bulk_insert_joins_loop.start())
+        registry.register("stats.gateway_worker", self.gateway_worker.start())
+        registry.register("stats.sample_latency", self.sample_latency_loop.start())
+        registry.register("stats.refresh_views", self.refresh_views_loop.start())
 
     async def cog_unload(self):
+        self.partition_commands_loop.stop()
+        self.sample_latency_loop.stop()
+        self.refresh_views_loop.stop()
         self.bulk_insert_commands_loop.stop()
         self.bulk_insert_joins_loop.stop()
         self.gateway_worker.cancel()
 
+    @tasks.loop(hours=6.0)
+    async def partition_commands_loop(self):
+        await self.maintain_command_partitions()
+        self.bot.task_registry.tick("stats.partition_commands")
+
     @tasks.loop(seconds=10.0)
     async def bulk_insert_commands_loop(self):
-        async with self._batch_commands_lock:
-            await self.bulk_insert_commands()
+        await self.bulk_insert_commands()
+        self.bot.task_registry.tick("stats.bulk_insert_commands")
 
     @tasks.loop(seconds=10.0)
     async def bulk_insert_joins_loop(self):
-        async with self._batch_joins_lock:
-            await self.bulk_insert_joins()
+        await self.bulk_insert_joins()
+        self.bot.task_registry.tick("stats.bulk_insert_joins")
+
+    @tasks.loop(minutes=15.0)
+    async def refresh_views_loop(self):
+        await self.refresh_materialized_views()
+        self.bot.task_registry.tick("stats.refresh_views")
 
-    @tasks.loop(seconds=0.0)
+    @tasks.loop(minutes=1.0)
+    async def sample_latency_loop(self):
+        for shard_id, shard in self.bot.shards.items():
+            stats = self.bot.shard_stats[shard_id]
+            stats.add_latency(shard.latency)
+            # socket_event_type doesn't say which shard an event came from, but each shard's sequence does
+            ws = shard._parent.ws
+            stats.add_sequence(ws and ws.sequence)
+        # the in-memory samples above keep working while the database is unavailable
+        try:
+            await self.record_shard_metrics()
+        except (OSError, asyncpg.PostgresError) as e:
+            log.error("Failed to record shard metrics", exc_info=e)
+            self.bot.task_registry.fail("stats.sample_latency", e)
+        self.bot.task_registry.tick("stats.sample_latency")
+
+    async def record_shard_metrics(self) -> None:
+        """Adds a latency and guild count sample per shard to every resolution of ``shardmetrics``."""
+        now = discord.utils.utcnow().replace(tzinfo=None, second=0, microsecond=0)
+        guilds = Counter(g.shard_id for g in self.bot.guilds)
+        shard_ids, latencies, samples, guild_counts = [], [], [], []
+        for shard_id, shard in self.bot.shards.items():
+            connected = math.isfinite(shard.latency)
+            shard_ids.append(shard_id)
+            latencies.append(shard.latency if connected else 0.0)
+            samples.append(int(connected))
+            guild_counts.append(guilds[shard_id])
+
+        query = """INSERT INTO shardmetrics AS m (resolution, bucket, shard_id, latency_sum, samples, guild_count)
+                   SELECT r.resolution, date_trunc(r.resolution, $1::timestamp), s.shard_id, s.latency, s.samples, s.guild_count
+                   FROM unnest($2::integer[], $3::double precision[], $4::integer[], $5::bigint[])
+                     AS s(shard_id, latency, samples, guild_count)
+                   CROSS JOIN (VALUES ('minute'), ('hour'), ('day')) AS r(resolution)
+                   ON CONFLICT (resolution, shard_id, bucket) DO UPDATE SET
+                     latency_sum = m.latency_sum + EXCLUDED.latency_sum,
+                     samples = m.samples + EXCLUDED.samples,
+                     guild_count = EXCLUDED.guild_count;
+                """
+        async with self.bot.pool.acquire() as con:
+            await con.execute(query, now, shard_ids, latencies, samples, guild_counts)
+            # pruned on elapsed time since the loop drifts and can skip any given minute
+            if self._metrics_pruned_at is None or now - self._metrics_pruned_at >= datetime.timedelta(hours=1):
+                query = """DELETE FROM shardmetrics
+                           WHERE (resolution = 'minute' AND bucket < $1::timestamp - INTERVAL '1 day')
+                           OR (resolution = 'hour' AND bucket < $1::timestamp - INTERVAL '30 days');
+                        """
+                await con.execute(query, now)
+                self._metrics_pruned_at = now
+
+    @tasks.loop(seconds=5.0)
     async def gateway_worker(self):
-        record = await self._gateway_queue.get()
-        await self.notify_gateway_status(record)
+        await self.notify_gateway_status()
+        self.bot.task_registry.tick("stats.gateway_worker")
 
     @discord.utils.cached_property
     def webhook(self):
@@ -254,36 +777,32 @@ class Stats(commands.Cog, command_attrs=dict(hidden=True)):
 
         command_with_args = message.content or f"{ctx.clean_prefix}{command} {' '.join([a for a in ctx.args[2:] if a])}{' ' and ' '.join([str(k) for k in ctx.kwargs.values()])}"
         log.info(f'{message.author} in {destination} [{ctx.lang_code}]: {command_with_args}')
-        async with self._batch_commands_lock:
-            self._data_commands_batch.append({
-                'guild': guild_id,
-                'channel': ctx.channel.id,
-                'author': ctx.author.id,
-                'used': message.created_at.isoformat(),
-                'prefix': ctx.prefix,
-                'command': command,
-                'failed': ctx.command_failed,
-            })
+        used = message.created_at.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        self.top_commands.add(command, used)
+        self.top_guilds.add(guild_id or 0, used)
+        self.top_authors.add(ctx.author.id, used)
+        cost = ctx.query_stats
+        row = (guild_id, ctx.channel.id, ctx.author.id, used, ctx.prefix, command, ctx.command_failed)
+        if cost is not None:
+            row += (cost.queries, cost.rows, cost.elapsed)
+        else:
+            row += (None, None, None)
+        if self._commands_buffer.add(row):
+            await self._flush_early(self._commands_buffer)
 
     async def register_joins(self, guild: discord.Guild, joined: Optional[bool] = None):
-        async with self._batch_joins_lock:
-            self._data_joins_batch.append({
-                'guild': guild.id,
-                'time': discord.utils.utcnow().isoformat(),
-                'joined': joined,
-                'current_count': len(self.bot.guilds),
-            })
+        now = discord.utils.utcnow().replace(tzinfo=None)
+        if self._joins_buffer.add((guild.id, joined, len(self.bot.guilds), now)):
+            await self._flush_early(self._joins_buffer)
 
     @commands.Cog.listener()
     async def on_command_completion(self, ctx: Context):
-        if ctx.interaction:
-            return
         await self.register_command(ctx)
 
     @commands.Cog.listener()
     async def on_interaction(self, interaction: discord.Interaction):
-        ctx = await Context.from_interaction(interaction)
-        await self.register_command(ctx)
+        # every application command is hybrid, so they're registered on completion like text commands
+        self.interaction_stats[interaction.type.name] += 1
 
     @commands.Cog.listener()
     async def on_guild_join(self, guild: discord.Guild):
@@ -296,6 +815,7 @@ class Stats(commands.Cog, command_attrs=dict(hidden=True)):
     @commands.Cog.listener()
     async def on_socket_event_type(self, event_type):
         self.bot.socket_stats[event_type] += 1
+        self.bot.socket_events.add()
 
     @commands.group("commandstats", invoke_without_command=True)
     async def commandstats(self, ctx, limit=20):
@@ -317,7 +837,30 @@ class Stats(commands.Cog, command_attrs=dict(hidden=True)):
         minutes = delta.total_seconds() / 60
         total = sum(self.bot.socket_stats.values())
         cpm = total / minutes
-        await ctx.send(f"{total:,} socket events observed ({cpm:.2f}/min):\n{self.bot.socket_stats}")
+        events = self.bot.socket_events
+        # the current minute is still filling up, so rates use the ones before it
+        last_hour = events.series(61)[:-1]
+        rates = (
+            f"Last minute: {last_hour[-1]:,.0f}/min, "
+            f"15 minutes: {sum(last_hour[-15:]) / 15:,.2f}/min, "
+            f"hour: {sum(last_hour) / 60:,.2f}/min, "
+            f"day: {events.total(60 * 24) / (60 * 24):,.2f}/min"
+        )
+        shard_rates = []
+        for shard_id, stats in sorted(self.bot.shard_stats.items()):
+            # sampled once a minute, so the current minute may not have its sample yet
+            series = stats.events.series(61)[:-1]
+            shard_rates.append(
+                f"Shard {shard_id}: last minute: {series[-1]:,.0f}/min, "
+                f"15 minutes: {sum(series[-15:]) / 15:,.2f}/min, "
+                f"hour: {sum(series) / 60:,.2f}/min"
+            )
+        shards = "\n".join(shard_rates) or "No shards sampled yet"
+        interactions = ", ".join(f"{name}: {count:,}" for name, count in self.interaction_stats.most_common())
+        await ctx.send(
+            f"{total:,} socket events observed ({cpm:.2f}/min):\nAll shards: {rates}\n{shards}\n"
+            f"{self.bot.socket_stats}\nInteractions: {interactions or 'None'}"
+        )
 
     def censor_object(self, obj):
         if not isinstance(obj, str) and obj.id in self.bot.blacklist:
@@ -332,79 +875,151 @@ class Stats(commands.Cog, command_attrs=dict(hidden=True)):
           "\N{SPORTS MEDAL}"
     )
 
+    def _format_top_guilds(self, records) -> str:
+        value = []
+        for (i, (guild_id, uses)) in enumerate(records):
+            if guild_id == 0:
+                guild = "Private Message"
+            else:
+                guild = self.censor_object(self.bot.get_guild(guild_id) or f"<Unknown {guild_id}>")
+            value.append(f"{self.medal_lookup[i]}: {guild} ({uses} uses)")
+        return "\n".join(value)
+
+    def _format_top_users(self, records) -> str:
+        value = []
+        for (i, (author_id, uses)) in enumerate(records):
+            user = self.censor_object(self.bot.get_user(author_id) or f"<Unknown {author_id}>")
+            value.append(f"{self.medal_lookup[i]}: {user} ({uses} uses)")
+        return "\n".join(value)
+
     @commandstats.command("global")
     async def commandstats_global(self, ctx: Context):
-        query = """SELECT COUNT(*) FROM commands;"""
+        query = """SELECT COALESCE(SUM(uses), 0) FROM commands_hourly;"""
         total = await ctx.db.fetchrow(query)
 
         e = discord.Embed(title="Command Stats", colour=discord.Colour.blurple())
         e.description = f"{total[0]:,} commands used."
 
-        query = """SELECT command, COUNT(*) AS "uses"
-               FROM commands
-               GROUP BY command
-               ORDER BY uses DESC
-               LIMIT 5;"""
+        query = """SELECT command, SUM(uses) AS "uses"
+                   FROM commands_hourly
+                   GROUP BY command
+                   ORDER BY "uses" DESC
+                   LIMIT 5;
+                """
 
         records = await ctx.db.fetch(query)
         value = "\n".join(f"{self.medal_lookup[i]}: {command} ({uses} uses)" for (i, (command, uses)) in enumerate(records))
         e.add_field(name="Top Commands", value=value, inline=False)
 
-        query = """SELECT guild_id, COUNT(*) AS "uses"
-               FROM commands
-               GROUP BY guild_id
-               ORDER BY uses DESC
-               LIMIT 5;"""
+        query = """SELECT guild_id, SUM(uses) AS "uses"
+                   FROM command_guilds_hourly
+                   GROUP BY guild_id
+                   ORDER BY "uses" DESC
+                   LIMIT 5;
+                """
 
         records = await ctx.db.fetch(query)
-        value = []
-        for (i, (guild_id, uses)) in enumerate(records):
-            if guild_id is None:
-                guild = "Private Message"
-            else:
-                guild = self.censor_object(self.bot.get_guild(guild_id.isdigit() and int(guild_id, base=10)) or f"<Unknown {guild_id}>")
+        e.add_field(name="Top Guilds", value=self._format_top_guilds(records), inline=False)
 
-            emoji = self.medal_lookup[i]
-            value.append(f"{emoji}: {guild} ({uses} uses)")
-
-        e.add_field(name="Top Guilds", value="\n".join(value), inline=False)
-
-        query = """SELECT author_id, COUNT(*) AS "uses"
-               FROM commands
-               GROUP BY author_id
-               ORDER BY "uses" DESC
-               LIMIT 5;"""
+        query = """SELECT author_id, SUM(uses) AS "uses"
+                   FROM command_authors_hourly
+                   GROUP BY author_id
+                   ORDER BY "uses" DESC
+                   LIMIT 5;
+                """
 
         records = await ctx.db.fetch(query)
-        value = []
-        for (i, (author_id, uses)) in enumerate(records):
-            user = self.censor_object(self.bot.get_user(author_id.isdigit() and int(author_id, base=10)) or f"<Unknown {author_id}>")
-            emoji = self.medal_lookup[i]
-            value.append(f"{emoji}: {user} ({uses} uses)")
+        e.add_field(name="Top Users", value=self._format_top_users(records), inline=False)
+        await ctx.send(embed=e)
 
-        e.add_field(name="Top Users", value="\n".join(value), inline=False)
+    @commandstats.command("cost")
+    async def commandstats_cost(self, ctx: Context, days: int = 1):
+        """The commands that spend the most time in the database."""
+        query = """SELECT command,
+                          COUNT(*) AS "uses",
+                          round(AVG(queries), 1) AS "avg queries",
+                          round(AVG(query_rows), 1) AS "avg rows",
+                          round((AVG(query_time) * 1000)::numeric, 1) AS "avg ms",
+                          round((SUM(query_time) * 1000)::numeric) AS "total ms"
+                   FROM commands
+                   WHERE used > ((now() at time zone 'utc') - $1::interval)
+                   AND queries IS NOT NULL
+                   GROUP BY command
+                   ORDER BY SUM(query_time) DESC
+                   LIMIT 15;
+                """
+        await self.tabulate_query(ctx, query, datetime.timedelta(days=days))
+
+    @commandstats.command("partition")
+    async def commandstats_partition(self, ctx: Context):
+        """Migrates an unpartitioned commands table to monthly partitions."""
+        async with self._commands_buffer.lock:
+            async with self.bot.pool.acquire() as con:
+                if await self.commands_partitioned(con):
+                    return await ctx.send("The commands table is already partitioned.")
+
+                async with con.transaction():
+                    # the views would follow the table to commands_legacy and block dropping it,
+                    # and the legacy indexes would take the names of the partitioned table's
+                    for name in MATERIALIZED_VIEWS:
+                        await con.execute(f"DROP MATERIALIZED VIEW IF EXISTS {name};")
+                    await con.execute("ALTER TABLE commands RENAME TO commands_legacy;")
+                    for index in Commands.indexes:
+                        await con.execute(f"DROP INDEX IF EXISTS {index.name};")
+                    await con.execute(Commands.create_table(exists_ok=False))
+                    since = await con.fetchval("SELECT MIN(used) FROM commands_legacy;")
+                    await self.create_command_partitions(con, since=since or discord.utils.utcnow().replace(tzinfo=None))
+                    status = await con.execute(
+                        """INSERT INTO commands (guild_id, channel_id, author_id, used, prefix, command, failed, queries, query_rows, query_time)
+                           SELECT guild_id, channel_id, author_id, used, prefix, command, failed, queries, query_rows, query_time
+                           FROM commands_legacy
+                           WHERE used IS NOT NULL;
+                        """
+                    )
+                    await con.execute("DROP TABLE commands_legacy;")
+                    await con.execute(create_materialized_views())
+                    await con.execute(
+                        "UPDATE view_refreshes SET refreshed_at = (now() at time zone 'utc') WHERE name = ANY($1::text[]);",
+                        list(MATERIALIZED_VIEWS),
+                    )
+        await ctx.send(f"Moved {status.split()[-1]} commands into monthly partitions.")
+
+    @commandstats.command("live")
+    async def commandstats_live(self, ctx: Context, window: Literal["hour", "day", "week"] = "day"):
+        """Approximate top commands, guilds and users since the last restart, without the database."""
+        now = discord.utils.utcnow().replace(tzinfo=None)
+        e = discord.Embed(title=f"Live Command Stats (last {window})", colour=discord.Colour.blurple())
+
+        records = self.top_commands.most_common(window, 5, now)
+        value = "\n".join(f"{self.medal_lookup[i]}: {command} (~{uses} uses)" for (i, (command, uses)) in enumerate(records))
+        e.add_field(name="Top Commands", value=value or "Nothing yet", inline=False)
+        e.add_field(name="Top Guilds", value=self._format_top_guilds(self.top_guilds.most_common(window, 5, now)) or "Nothing yet", inline=False)
+        e.add_field(name="Top Users", value=self._format_top_users(self.top_authors.most_common(window, 5, now)) or "Nothing yet", inline=False)
         await ctx.send(embed=e)
 
     @commandstats.command("today")
     async def commandstats_today(self, ctx: Context):
-        query = """SELECT failed, COUNT(*) FROM commands WHERE used > (CURRENT_TIMESTAMP - INTERVAL '1 day') GROUP BY failed;"""
+        # the rollups are bucketed by naive UTC hours, so "today" covers the last 24-25 hours
+        query = """SELECT failed, SUM(uses)
+                   FROM commands_hourly
+                   WHERE hour > date_trunc('hour', (now() at time zone 'utc') - INTERVAL '1 day')
+                   GROUP BY failed;
+                """
         total = await ctx.db.fetch(query)
-        failed, success, question = 0, 0, 0
+        failed, success = 0, 0
         for state, count in total:
-            if state is False:
-                success += count
-            elif state is True:
+            if state:
                 failed += count
             else:
-                question += count
+                success += count
 
         e = discord.Embed(title="Last 24 Hour Command Stats", colour=discord.Colour.blurple())
-        e.description = f"{failed + success + question:,} commands used today." \
-                        f"({success} succeeded, {failed} failed, {question} unknown)"
+        e.description = f"{failed + success:,} commands used today. " \
+                        f"({success} succeeded, {failed} failed)"
 
-        query = """SELECT command, COUNT(*) AS "uses"
-                   FROM commands
-                   WHERE used > (CURRENT_TIMESTAMP - INTERVAL '1 day')
+        query = """SELECT command, SUM(uses) AS "uses"
+                   FROM commands_hourly
+                   WHERE hour > date_trunc('hour', (now() at time zone 'utc') - INTERVAL '1 day')
                    GROUP BY command
                    ORDER BY "uses" DESC
                    LIMIT 5;
@@ -414,44 +1029,67 @@ class Stats(commands.Cog, command_attrs=dict(hidden=True)):
         value = '\n'.join(f'{self.medal_lookup[index]}: {command} ({uses} uses)' for (index, (command, uses)) in enumerate(records))
         e.add_field(name='Top Commands', value=value, inline=False)
 
-        query = """SELECT guild_id, COUNT(*) AS "uses"
-                   FROM commands
-                   WHERE used > (CURRENT_TIMESTAMP - INTERVAL '1 day')
+        query = """SELECT guild_id, SUM(uses) AS "uses"
+                   FROM command_guilds_hourly
+                   WHERE hour > date_trunc('hour', (now() at time zone 'utc') - INTERVAL '1 day')
                    GROUP BY guild_id
                    ORDER BY "uses" DESC
                    LIMIT 5;
                 """
 
         records = await ctx.db.fetch(query)
-        value = []
-        for (index, (guild_id, uses)) in enumerate(records):
-            if guild_id is None:
-                guild = 'Private Message'
-            else:
-                guild = self.censor_object(self.bot.get_guild(guild_id.isdigit() and int(guild_id, base=10)) or f'<Unknown {guild_id}>')
-            emoji = self.medal_lookup[index]
-            value.append(f'{emoji}: {guild} ({uses} uses)')
+        e.add_field(name='Top Guilds', value=self._format_top_guilds(records), inline=False)
 
-        e.add_field(name='Top Guilds', value='\n'.join(value), inline=False)
-
-        query = """SELECT author_id, COUNT(*) AS "uses"
-                  FROM commands
-                  WHERE used > (CURRENT_TIMESTAMP - INTERVAL '1 day')
-                  GROUP BY author_id
-                  ORDER BY "uses" DESC
-                  LIMIT 5;
-              """
+        query = """SELECT author_id, SUM(uses) AS "uses"
+                   FROM command_authors_hourly
+                   WHERE hour > date_trunc('hour', (now() at time zone 'utc') - INTERVAL '1 day')
+                   GROUP BY author_id
+                   ORDER BY "uses" DESC
+                   LIMIT 5;
+                """
 
         records = await ctx.db.fetch(query)
-        value = []
-        for (index, (author_id, uses)) in enumerate(records):
-            user = self.censor_object(self.bot.get_user(author_id.isdigit() and int(author_id, base=10)) or f'<Unknown {author_id}>')
-            emoji = self.medal_lookup[index]
-            value.append(f'{emoji}: {user} ({uses} uses)')
-
-        e.add_field(name='Top Users', value='\n'.join(value), inline=False)
+        e.add_field(name='Top Users', value=self._format_top_users(records), inline=False)
         await ctx.send(embed=e)
 
+    @commandstats.command("rebuild")
+    async def commandstats_rebuild(self, ctx: Context):
+        """Rebuilds the hourly rollups from the raw command history."""
+        async with self._commands_buffer.lock:
+            async with self.bot.pool.acquire() as con:
+                async with con.transaction():
+                    # archived months only survive in the rollups, so only replace what the raw table still covers
+                    since = await con.fetchval("SELECT date_trunc('hour', MIN(used)) FROM commands;")
+                    if since is not None:
+                        await con.execute("DELETE FROM commands_hourly WHERE hour >= $1;", since)
+                        await con.execute("DELETE FROM command_guilds_hourly WHERE hour >= $1;", since)
+                        await con.execute("DELETE FROM command_authors_hourly WHERE hour >= $1;", since)
+                    await con.execute(
+                        """INSERT INTO commands_hourly (hour, command, failed, uses)
+                           SELECT date_trunc('hour', used), command, COALESCE(failed, false), COUNT(*)
+                           FROM commands
+                           WHERE used IS NOT NULL AND command IS NOT NULL
+                           GROUP BY 1, 2, 3;
+                        """
+                    )
+                    await con.execute(
+                        """INSERT INTO command_guilds_hourly (hour, guild_id, uses)
+                           SELECT date_trunc('hour', used), COALESCE(guild_id, 0), COUNT(*)
+                           FROM commands
+                           WHERE used IS NOT NULL
+                           GROUP BY 1, 2;
+                        """
+                    )
+                    await con.execute(
+                        """INSERT INTO command_authors_hourly (hour, author_id, uses)
+                           SELECT date_trunc('hour', used), author_id, COUNT(*)
+                           FROM commands
+                           WHERE used IS NOT NULL
+                           GROUP BY 1, 2;
+                        """
+                    )
+        await ctx.send("Rebuilt the hourly command rollups.")
+
     @commandstats_today.before_invoke
     @commandstats_global.before_invoke
     async def before_stats_invoke(self, ctx):
@@ -462,26 +1100,16 @@ class Stats(commands.Cog, command_attrs=dict(hidden=True)):
         await self.register_command(ctx)
 
     def add_record(self, record):
-        self._gateway_queue.put_nowait(record)
-
-    async def notify_gateway_status(self, record):
-        attributes = {
-            'INFO': '\N{INFORMATION SOURCE}',
-            'WARNING': '\N{WARNING SIGN}'
-        }
+        self._gateway_digest.add(record)
 
-        emoji = attributes.get(record.levelname, '\N{CROSS MARK}')
-        dt = datetime.datetime.utcfromtimestamp(record.created)
-        msg = textwrap.shorten(f'{emoji} [{time.format_dt(dt)}] `{record.msg % record.args}`', width=1990)
-        await self.webhook.send(msg, username='Gateway', avatar_url='https://i.imgur.com/4PnCKB3.png')
+    async def notify_gateway_status(self):
+        for digest in self._gateway_digest.drain():
+            await self.webhook.send(digest, username='Gateway', avatar_url='https://i.imgur.com/4PnCKB3.png')
 
     @commands.command("bothealth")
     async def bothealth(self, ctx: Context):
         """Various bot health monitoring tools."""
 
-        # This uses a lot of private methods because there is no
-        # clean way of doing this otherwise.
-
         HEALTHY = discord.Colour(value=0x43B581)
         UNHEALTHY = discord.Colour(value=0xF04947)
         WARNING = discord.Colour(value=0xF09E47)
@@ -491,27 +1119,13 @@ class Stats(commands.Cog, command_attrs=dict(hidden=True)):
 
         # Check the connection pool health.
         pool = self.bot.pool
-        total_waiting = len(pool._queue._getters)
-        current_generation = pool._generation
+        in_use = pool.get_size() - pool.get_idle_size()
+        pool_exhausted = in_use >= pool.get_max_size()
 
         description = [
-            f'Total `Pool.acquire` Waiters: {total_waiting}',
-            f'Current Pool Generation: {current_generation}',
-            f'Connections In Use: {len(pool._holders) - pool._queue.qsize()}'
+            f'Connections In Use: {in_use}/{pool.get_max_size()}',
         ]
-
-        questionable_connections = 0
-        connection_value = []
-        for index, holder in enumerate(pool._holders, start=1):
-            generation = holder._generation
-            in_use = holder._in_use is not None
-            is_closed = holder._con is None or holder._con.is_closed()
-            display = f'gen={holder._generation} in_use={in_use} closed={is_closed}'
-            questionable_connections += any((in_use, generation != current_generation))
-            connection_value.append(f'<Holder i={index} {display}>')
-
-        joined_value = '\n'.join(connection_value)
-        embed_.add_field(name='Connections', value=f'```py\n{joined_value}\n```', inline=False)
+        total_warnings += pool_exhausted
 
         spam_control = self.bot.spam_control
         being_spammed = [
@@ -520,41 +1134,35 @@ class Stats(commands.Cog, command_attrs=dict(hidden=True)):
         ]
 
         description.append(f'Current Spammers: {", ".join(being_spammed) if being_spammed else "None"}')
-        description.append(f'Questionable Connections: {questionable_connections}')
-
-        total_warnings += questionable_connections
         if being_spammed:
             embed_.colour = WARNING
             total_warnings += 1
 
-        try:
-            task_retriever = asyncio.Task.all_tasks
-        except AttributeError:
-            # future proofing for 3.9 I guess
-            task_retriever = asyncio.all_tasks
-
-        all_tasks = task_retriever(loop=self.bot.loop)
-
-        event_tasks = [
-            t for t in all_tasks
-            if 'Client._run_event' in repr(t) and not t.done()
-        ]
-
-        cogs_directory = os.path.dirname(__file__)
-        tasks_directory = os.path.join('discord', 'ext', 'tasks', '__init__.py')
-        inner_tasks = [
-            t for t in all_tasks
-            if cogs_directory in repr(t) or tasks_directory in repr(t)
-        ]
-
-        bad_inner_tasks = ", ".join(hex(id(t)) for t in inner_tasks if t.done() and t._exception is not None)
-        total_warnings += bool(bad_inner_tasks)
-        embed_.add_field(name='Inner Tasks', value=f'Total: {len(inner_tasks)}\nFailed: {bad_inner_tasks or "None"}')
-        embed_.add_field(name='Events Waiting', value=f'Total: {len(event_tasks)}', inline=False)
-
-        command_waiters = len(self._data_commands_batch)
-        is_locked = self._batch_commands_lock.locked()
+        registry = self.bot.task_registry
+        task_value = []
+        for entry in registry.snapshot():
+            total_warnings += not entry.running
+            last_tick = time.format_dt(entry.last_tick, 'R') if entry.last_tick else 'never'
+            failure = f', last: `{entry.last_exception!r}`' if entry.last_exception else ''
+            task_value.append(
+                f'{"" if entry.running else "**Stopped** "}`{entry.name}`: ticked {last_tick}, '
+                f'{entry.restarts} restarts, {entry.failures} failures{failure}'
+            )
+        embed_.add_field(name='Background Tasks', value=('\n'.join(task_value) or 'None')[:1024], inline=False)
+        embed_.add_field(name='Events Waiting', value=f'Total: {len(registry.events)}', inline=False)
+
+        command_waiters = len(self._commands_buffer)
+        is_locked = self._commands_buffer.lock.locked()
         description.append(f'Commands Waiting: {command_waiters}, Batch Locked: {is_locked}')
+        dropped = self._commands_buffer.dropped + self._joins_buffer.dropped
+        description.append(f'Telemetry Rows Dropped: {dropped}')
+        total_warnings += bool(dropped)
+        digest = self._gateway_digest
+        description.append(f'Gateway Records Pending: {len(digest)}, Dropped: {digest.dropped}')
+
+        reminders = getattr(self.bot.get_cog("TaskTracker"), "reminders", None)
+        if reminders is not None:
+            description.append(reminders.report())
 
         memory_usage = self.process.memory_full_info().uss / 1024**2
         total_memory = psutil.virtual_memory().total / 1024**2
@@ -576,18 +1184,124 @@ class Stats(commands.Cog, command_attrs=dict(hidden=True)):
         embed_.description = '\n'.join(description)
         await ctx.send(embed=embed_)
 
+    @commands.command("looplag")
+    async def looplag(self, ctx: Context, stalls: int = 5):
+        """Shows event loop lag and the stacks captured while the loop was blocked."""
+        watchdog = self.bot.watchdog
+        if watchdog is None:
+            return await ctx.send("The loop watchdog is disabled, set `loop_watchdog = True` in the config to enable it.")
+
+        e = discord.Embed(title="Event Loop Lag", colour=discord.Colour.blurple())
+        e.description = (
+            f"Lag p50/p95: {watchdog.percentile(0.5) * 1000:,.1f}/{watchdog.percentile(0.95) * 1000:,.1f} ms\n"
+            f"Max Lag: {watchdog.max_lag * 1000:,.1f} ms\n"
+            f"Stalls Over {watchdog.threshold * 1000:,.0f} ms: {len(watchdog.stalls)}"
+        )
+
+        recent = list(watchdog.stalls)[-stalls:] if stalls > 0 else []
+        if not recent:
+            return await ctx.send(embed=e)
+
+        fp = io.StringIO()
+        for stall in reversed(recent):
+            fp.write(f"{stall.when.isoformat()} blocked for {stall.lag * 1000:,.1f} ms\n")
+            fp.write("".join(stall.stack))
+            fp.write("\n")
+        fp = io.BytesIO(fp.getvalue().encode("utf-8"))
+        await ctx.send(embed=e, file=discord.File(fp, filename="stalls.txt"))
+
+    @commands.command("export")
+    async def export(
+        self,
+        ctx: Context,
+        start: Annotated[datetime.datetime, iso_date],
+        end: Annotated[datetime.datetime, iso_date],
+        fmt: Literal["csv", "ndjson"] = "csv",
+    ):
+        """Exports commands and guild joins between two YYYY-MM-DD dates to gzipped files on the host."""
+        directory = os.path.join(self.archive_dir, "exports")
+        async with ctx.typing():
+            async with self.bot.pool.acquire() as con:
+                paths = await export_tables(con, directory, start, end, fmt=fmt)
+        lines = [f"`{path}` ({os.path.getsize(path) / 1024:,.1f} KiB)" for path in paths]
+        await ctx.send("Exported to:\n" + "\n".join(lines))
+
+    @commands.command("shardhistory")
+    async def shardhistory(self, ctx: Context, resolution: Literal["minute", "hour", "day"] = "minute"):
+        """Sparklines of each shard's latency and guild count."""
+        points, width = SHARD_HISTORY[resolution]
+        now = discord.utils.utcnow().replace(tzinfo=None)
+        query = """SELECT shard_id, bucket, latency_sum / NULLIF(samples, 0) AS "latency", guild_count
+                   FROM shardmetrics
+                   WHERE resolution = $1 AND bucket > $2
+                   ORDER BY shard_id, bucket;
+                """
+        records = await ctx.db.fetch(query, resolution, now - width * points)
+        if not records:
+            return await ctx.send("No shard metrics recorded yet.")
+
+        start = now - width * points
+        shards: dict[int, tuple[list[Optional[float]], list[Optional[float]]]] = {}
+        for record in records:
+            latency, guild_count = shards.setdefault(record["shard_id"], ([None] * points, [None] * points))
+            index = min(points - 1, int((record["bucket"] - start) / width))
+            latency[index] = None if record["latency"] is None else record["latency"] * 1000
+            guild_count[index] = record["guild_count"]
+
+        lines = []
+        for shard_id, (latency, guild_count) in sorted(shards.items()):
+            known = [v for v in latency if v is not None]
+            guilds = [v for v in guild_count if v is not None]
+            lines.append(f"Shard {shard_id}")
+            lines.append(f"  latency {sparkline(latency)} {min(known, default=0):,.0f}-{max(known, default=0):,.0f} ms")
+            lines.append(f"  guilds  {sparkline(guild_count)} {guilds[-1] if guilds else 0:,}")
+
+        fmt = "\n".join(lines)
+        title = f"Last {points} {resolution}s"
+        if len(fmt) > 1900:
+            fp = io.BytesIO(fmt.encode("utf-8"))
+            return await ctx.send(title, file=discord.File(fp, filename="shardhistory.txt"))
+        await ctx.send(f"{title}\n```\n{fmt}\n```")
+
+    @commands.group("errors", invoke_without_command=True)
+    async def errors(self, ctx: Context, limit: int = 10):
+        """Lists the most frequent errors since startup by fingerprint."""
+        reports = self.bot.errors.most_common(limit)
+        if not reports:
+            return await ctx.send("No errors recorded.")
+
+        e = discord.Embed(title="Top Errors", colour=0xa32952)
+        for report in reports:
+            e.add_field(
+                name=f"{report.name} `{report.fingerprint}`",
+                value=textwrap.shorten(
+                    f"{report.count:,} times in {report.where}, first {time.format_dt(report.first_seen, 'R')}, "
+                    f"last {time.format_dt(report.last_seen, 'R')}: {report.message}",
+                    width=1024,
+                ),
+                inline=False,
+            )
+        e.set_footer(text=f"{len(self.bot.errors)} distinct errors")
+        await ctx.send(embed=e)
+
+    @errors.command("show")
+    async def errors_show(self, ctx: Context, fingerprint: str):
+        """Shows the first traceback recorded for an error fingerprint."""
+        report = self.bot.errors.get(fingerprint)
+        if report is None:
+            return await ctx.send("No error with that fingerprint.")
+
+        fmt = f"```py\n{report.traceback}\n```"
+        if len(fmt) > 2000:
+            fp = io.BytesIO(report.traceback.encode("utf-8"))
+            return await ctx.send(f"{report.name} `{report.fingerprint}`", file=discord.File(fp, filename="traceback.txt"))
+        await ctx.send(fmt)
+
     @commands.command("gateway")
     async def gateway(self, ctx: Context):
-        yesterday = discord.utils.utcnow() - datetime.timedelta(days=1)
-        identifies = {
-            shard_id: sum(1 for dt in dates if dt > yesterday)
-            for shard_id, dates in self.bot.identifies.items()
-        }
-
-        resumes = {
-            shard_id: sum(1 for dt in dates if dt > yesterday)
-            for shard_id, dates in self.bot.resumes.items()
-        }
+        shard_stats = self.bot.shard_stats
+        identifies = {shard_id: int(stats.identifies.total(24)) for shard_id, stats in shard_stats.items()}
+        resumes = {shard_id: int(stats.resumes.total(24)) for shard_id, stats in shard_stats.items()}
 
         total_identifies = sum(identifies.values())
         builder = [
@@ -626,7 +1340,11 @@ class Stats(commands.Cog, command_attrs=dict(hidden=True)):
             if resume != 0:
                 stats.append(f"R: {resume}")
             if identify != 0:
-                stats.append(f"ID: {identify}")
+                recent = int(shard_stats[shard_id].identifies.total(1))
+                stats.append(f"ID: {identify}" + (f", {recent} this hour" if recent else ""))
+            latency = shard_stats[shard_id].latency.mean(5) if shard_id in shard_stats else None
+            if latency is not None:
+                stats.append(f"{latency * 1000:,.0f} ms")
 
             if stats:
                 builder.append(f"Shard ID {shard_id}: {badge} ({', '.join(stats)})")
@@ -668,24 +1386,44 @@ class Stats(commands.Cog, command_attrs=dict(hidden=True)):
         for page in paginator.pages:
             await ctx.send(page)
 
-    async def tabulate_query(self, ctx: Context, query: str, *args: Any):
-        records = await ctx.db.fetch(query, *args)
-
-        if len(records) == 0:
-            return await ctx.send('No results found.')
-
-        headers = list(records[0].keys())
-        table = TabularData()
-        table.set_columns(headers)
-        table.add_rows(list(r.values()) for r in records)
-        render = table.render()
-
-        fmt = f'```\n{render}\n```'
-        if len(fmt) > 2000:
-            fp = io.BytesIO(fmt.encode("utf-8"))
-            await ctx.send("Too many results to display.", file=discord.File(fp, filename="query.txt"))
-        else:
-            await ctx.send(fmt)
+    async def tabulate_query(self, ctx: Context, query: str, *args: Any, note: Optional[str] = None):
+        fmt, total, truncated = None, 0, False
+        prefix = f'{note}\n' if note else ''
+        fp = tempfile.SpooledTemporaryFile(max_size=TABULATE_SPOOL_SIZE)
+        try:
+            async with self.bot.pool.acquire() as con:
+                # cursors only exist inside a transaction
+                async with con.transaction():
+                    rows = con.cursor(query, *args, prefetch=TABULATE_SAMPLE_SIZE).__aiter__()
+                    sample = []
+                    async for record in rows:
+                        sample.append(record)
+                        if len(sample) >= TABULATE_SAMPLE_SIZE:
+                            break
+
+                    if len(sample) == 0:
+                        return await ctx.send('No results found.')
+
+                    headers = list(sample[0].keys())
+                    if len(sample) < TABULATE_SAMPLE_SIZE:
+                        table = TabularData()
+                        table.set_columns(headers)
+                        table.add_rows(list(r.values()) for r in sample)
+                        fmt = f'```\n{table.render()}\n```'
+                        total = len(sample)
+                        if len(prefix + fmt) > 2000:
+                            fp.write(fmt.encode('utf-8'))
+                    else:
+                        total, truncated = await stream_table(fp, headers, sample, rows, max_bytes=TABULATE_MAX_SIZE)
+
+            if fmt is not None and len(prefix + fmt) <= 2000:
+                return await ctx.send(prefix + fmt)
+
+            fp.seek(0)
+            message = f'{prefix}Too many results to display. ({total:,} rows{", truncated" if truncated else ""})'
+            await ctx.send(message, file=discord.File(fp, filename='query.txt'))  # type: ignore
+        finally:
+            fp.close()
 
     @commands.group("commandhistory", invoke_without_command=True)
     async def command_history(self, ctx: Context):
@@ -705,20 +1443,20 @@ class Stats(commands.Cog, command_attrs=dict(hidden=True)):
 
     @command_history.command("for")
     async def command_history_for(self, ctx: Context, days: Annotated[int, Optional[int]] = 7, *, command: str):
-        query = """SELECT *, t.success + t.failed AS "total"
-                FROM (
-                  SELECT guild_id,
-                         SUM(CASE WHEN failed THEN 0 ELSE 1 END) AS "success",
-                         SUM(CASE WHEN failed THEN 1 ELSE 0 END) AS "failed"
-                  FROM commands
-                  WHERE command=$1
-                  AND used > (CURRENT_TIMESTAMP - $2::interval)
-                  GROUP BY guild_id
-                ) AS t
-                ORDER BY "total" DESC
-                LIMIT 30;"""
+        query = """SELECT guild_id,
+                          SUM(success) AS "success",
+                          SUM(failed) AS "failed",
+                          SUM(success + failed) AS "total"
+                   FROM commandhistory_daily
+                   WHERE command=$1
+                   AND day > ((now() at time zone 'utc') - $2::interval)::date
+                   GROUP BY guild_id
+                   ORDER BY "total" DESC
+                   LIMIT 30;
+                """
 
-        await self.tabulate_query(ctx, query, command, datetime.timedelta(days=days))
+        note = await self.view_freshness("commandhistory_daily")
+        await self.tabulate_query(ctx, query, command, datetime.timedelta(days=days), note=note)
 
     @command_history.command("guild", aliases=["server"])
     async def command_history_guild(self, ctx: Context, guild_id: int):
@@ -734,7 +1472,7 @@ class Stats(commands.Cog, command_attrs=dict(hidden=True)):
                WHERE guild_id=$1
                ORDER BY used DESC
                LIMIT 15;"""
-        await self.tabulate_query(ctx, query, str(guild_id))
+        await self.tabulate_query(ctx, query, guild_id)
 
     @command_history.command(name='user', aliases=['member'])
     async def command_history_user(self, ctx, user_id: int):
@@ -752,21 +1490,17 @@ class Stats(commands.Cog, command_attrs=dict(hidden=True)):
                   ORDER BY used DESC
                   LIMIT 20;
               """
-        await self.tabulate_query(ctx, query, str(user_id))
+        await self.tabulate_query(ctx, query, user_id)
 
     @commands.group("commandactivity", invoke_without_command=True)
     async def command_activity(self, ctx: Context):
-        # WHERE used > (CURRENT_TIMESTAMP - '1 day'::interval)
-        query = """SELECT
-                  extract(hour from used) AS "hour",
-                  SUM(CASE WHEN failed THEN 0 ELSE 1 END) AS "success"
-              FROM commands
-              GROUP BY extract(hour from used)
-              ORDER BY extract(hour from used);"""
+        query = """SELECT hour, success FROM commandactivity_hourly ORDER BY hour;"""
         record = await ctx.db.fetch(query)
         hours = [0] * 24
         for r in record:
             hours[int(r["hour"])] = r["success"]
+        if not any(hours):
+            return await ctx.send("No command activity recorded yet.")
 
         graph = ""
         space = 30
@@ -778,7 +1512,7 @@ class Stats(commands.Cog, command_attrs=dict(hidden=True)):
         graph += f"   0 {'-':->{space/2-len(str(mid))}} {mid} {'-':->{space/2-len(str(mid))}} {max(hours):,}\n"
         graph = graph.strip()
 
-        await ctx.send(f"```\n{graph}\n```")
+        await ctx.send(f"{await self.view_freshness('commandactivity_hourly')}\n```\n{graph}\n```")
 
 
 old_on_error = commands.AutoShardedBot.on_error
@@ -790,8 +1524,15 @@ async def on_error(self, event: str, *args: Any, **kwargs: Any) -> None:
     if isinstance(exc, commands.CommandInvokeError):
         return
 
+    if exc is not None and not self.log_error(exc, f"event {event}"):
+        return
+
     e = discord.Embed(title="Event Error", colour=0xa32952)
     e.add_field(name="Event", value=event)
+    if exc is not None:
+        report = self.errors.get(fingerprint(exc))
+        if report is not None:
+            e.add_field(name="Fingerprint", value=f"`{report.fingerprint}` (seen {report.count:,} times)")
     trace = "".join(traceback.format_exception(exc_type, exc, tb))
     e.description = f"```py\n{trace}\n```"
     e.timestamp = discord.utils.utcnow()
@@ -815,6 +1556,10 @@ async def setup(bot: AutoShardedBot):
     if not hasattr(bot, "socket_stats"):
         bot.socket_stats = Counter()
 
+    if not hasattr(bot, "socket_events"):
+        # per minute for a day
+        bot.socket_events = RollingCounter(60 * 24)
+
     cog = Stats(bot)
     await bot.add_cog(cog)
     bot.gateway_handler = handler = GatewayHandler(cog)
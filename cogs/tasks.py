@@ -1,9 +1,19 @@
 from __future__ import annotations
 
 import asyncio
+import codecs
+import csv
 import datetime
+import io
+import itertools
+import json
 import logging
-from typing import TYPE_CHECKING, Literal, Optional, overload
+import random
+import tempfile
+import textwrap
+import time as _time
+from collections import deque
+from typing import IO, TYPE_CHECKING, Any, Iterator, List, Literal, Optional, Sequence, overload
 
 import asyncpg
 import discord
@@ -12,14 +22,15 @@ from discord.ext import commands, menus
 from utils import paginator
 from utils.cache import cache
 from utils.colours import MessageColors
-from utils.db import Column, Table
+from utils.db import Column, Index, Table
 from utils.embed import embed
 from utils.fuzzy import autocomplete
 from utils.time import ADT, NDT, NT, Interval, TimeOfDay, format_dt, human_timedelta
 
 if TYPE_CHECKING:
     from index import AutoShardedBot
-    from utils.context import Context
+    from utils.context import Context, GuildContext
+    from utils.health import TaskHealth
 
     from .reminder import Timer
 
@@ -38,14 +49,115 @@ class TasksTracked(Table):
     reset_datetime = Column("reset_datetime timestamp GENERATED ALWAYS AS (CASE WHEN interval > '1 day' THEN last_reset::date + time::time ELSE last_reset END) STORED")
     remind_me = Column("remind_me boolean NOT NULL DEFAULT false")
     completed = Column("completed boolean NOT NULL DEFAULT false")
+    # where and when the current completion was counted towards a leaderboard
+    completed_guild_id = Column("completed_guild_id bigint")
+    completed_week = Column("completed_week date")
 
+    user_id_reset_idx = Index("taskstracked_user_id_reset_idx", "user_id, reset_datetime, id")
+
+    @classmethod
+    def create_table(cls, *, exists_ok=True) -> str:
+        statement = super().create_table(exists_ok=exists_ok)
+        # added after the table was first created
+        return statement + """
+ALTER TABLE taskstracked ADD COLUMN IF NOT EXISTS completed_guild_id bigint;
+ALTER TABLE taskstracked ADD COLUMN IF NOT EXISTS completed_week date;"""
+
+
+class TaskCompletions(Table):
+    guild_id = Column("guild_id bigint NOT NULL")
+    user_id = Column("user_id bigint NOT NULL")
+    week = Column("week date NOT NULL")
+    completions = Column("completions integer NOT NULL DEFAULT 0")
+    primary_key = Column("PRIMARY KEY (guild_id, user_id, week)")
+
+    leaderboard_idx = Index("taskcompletions_leaderboard_idx", "guild_id, week, completions DESC")
+
+
+class DMChannels(Table):
+    user_id = Column("user_id bigint PRIMARY KEY")
+    channel_id = Column("channel_id bigint NOT NULL")
+    closed = Column("closed boolean NOT NULL DEFAULT false")
+
+
+class TaskHistory(Table):
+    id = Column("id bigint PRIMARY KEY GENERATED ALWAYS AS IDENTITY")
+    task_id = Column("task_id bigint NOT NULL REFERENCES taskstracked (id) ON DELETE CASCADE")
+    user_id = Column("user_id bigint NOT NULL")
+    reset = Column("reset timestamp NOT NULL DEFAULT (now() at time zone 'utc')")
+    completed = Column("completed boolean NOT NULL")
+
+    task_id_reset_idx = Index("taskhistory_task_id_reset_idx", "task_id, reset")
+
+
+class TaskStreaks(Table):
+    task_id = Column("task_id bigint PRIMARY KEY REFERENCES taskstracked (id) ON DELETE CASCADE")
+    user_id = Column("user_id bigint NOT NULL")
+    current_streak = Column("current_streak integer NOT NULL DEFAULT 0")
+    best_streak = Column("best_streak integer NOT NULL DEFAULT 0")
+    total_completed = Column("total_completed integer NOT NULL DEFAULT 0")
+    total_missed = Column("total_missed integer NOT NULL DEFAULT 0")
+
+
+RECONCILE_INTERVAL = 15 * 60  # seconds
+MAX_IMPORT_SIZE = 5 * 1024 * 1024  # 5 MiB
+MAX_IMPORT_TASKS = 500
+EXPORT_COLUMNS = ("name", "interval", "time", "remind_me")
+
+
+def format_interval(interval: datetime.timedelta) -> str:
+    """Formats an interval in a way that :class:`utils.time.Interval` can parse again."""
+    weeks, days = divmod(interval.days, 7)
+    hours, remainder = divmod(interval.seconds, 3600)
+    minutes = remainder // 60
+    parts = [f"{value}{unit}" for value, unit in ((weeks, "w"), (days, "d"), (hours, "h"), (minutes, "m")) if value]
+    return "".join(parts) or "0m"
+
+
+def iter_json_objects(fp: IO[str], *, chunk_size: int = 65536) -> Iterator[Any]:
+    """Yields the elements of a JSON array or newline delimited JSON
+    one at a time, without loading the whole file into memory."""
+    decoder = json.JSONDecoder()
+    buffer, eof = "", False
+    while True:
+        buffer = buffer.lstrip(" \t\r\n,[]")
+        if buffer:
+            try:
+                obj, end = decoder.raw_decode(buffer)
+            except ValueError:
+                if eof:
+                    raise
+            else:
+                buffer = buffer[end:]
+                yield obj
+                continue
+        elif eof:
+            return
+
+        chunk = fp.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def parse_import_row(row: Any, *, now: ADT, timezone: datetime.tzinfo) -> tuple[str, datetime.timedelta, NDT, NT, bool]:
+    """Converts an imported row into the values of a ``task_import`` record."""
+    if not isinstance(row, dict):
+        raise commands.BadArgument("expected an object with a `name` and `interval`")
+
+    name = str(row.get("name") or "").strip()
+    if not name:
+        raise commands.BadArgument("missing task name")
+
+    interval = Interval(str(row.get("interval") or "").replace(" ", ""), _min=15 * 60).interval
+    start_time = row.get("time")
+    if start_time:
+        tod = TimeOfDay(str(start_time), now=now, timezone=timezone)
+    else:
+        tod = TimeOfDay.now(now=now, timezone=timezone)
+    dt: NDT = tod.dt.astimezone(datetime.timezone.utc).replace(tzinfo=None)  # type: ignore
+    remind_me = str(row.get("remind_me", "")).strip().lower() in ("true", "1", "yes", "y", "on")
+    return name, interval, dt, dt.time(), remind_me  # type: ignore
 
-# class taskHistory(Table):
-#     id = Column("id bigserial PRIMARY KEY NOT NULL")
-#     user_id = Column("user_id bigint NOT NULL")
-#     created = Column("created timestamp NOT NULL DEFAULT (now() at time zone 'utc')")
-#     missed_tasks = Column("missed_tasks bigint NOT NULL DEFAULT 0")
-#     completed_tasks = Column("completed_tasks bigint NOT NULL DEFAULT 0")
 
 NUMTOEMOTES = {
     0: "0️⃣",
@@ -90,16 +202,100 @@ class PaginatorSource(menus.ListPageSource):
         return True
 
 
+class AgendaPageSource(menus.PageSource):
+    """Pages through a user's upcoming tasks and reminders by keyset,
+    fetching each page only when it is first shown."""
+
+    query = """(SELECT 'task' AS kind, id, reset_datetime AS due, name AS title
+                FROM taskstracked
+                WHERE user_id = $1 AND reset_datetime >= $2
+                AND (reset_datetime, 'task', id) > ($2, $3::text, $4::bigint)
+                ORDER BY reset_datetime, id
+                LIMIT $5)
+               UNION ALL
+               (SELECT 'reminder', id, expires, extra #>> '{args,2}'
+                FROM reminders
+                WHERE event = 'reminder' AND extra #>> '{args,0}' = $1::text AND expires >= $2
+                AND (expires, 'reminder', id) > ($2, $3::text, $4::bigint)
+                ORDER BY expires, id
+                LIMIT $5)
+               ORDER BY due, kind, id
+               LIMIT $5;"""
+
+    def __init__(self, pool: asyncpg.Pool, user_id: int, *, per_page: int = 10):
+        self.pool: asyncpg.Pool = pool
+        self.user_id: int = user_id
+        self.per_page: int = per_page
+        self._pages: list[list[asyncpg.Record]] = []
+        self._max_pages: Optional[int] = None
+
+    async def prepare(self) -> None:
+        try:
+            await self.get_page(0)
+        except IndexError:
+            pass
+
+    @property
+    def empty(self) -> bool:
+        return self._max_pages == 0
+
+    async def _fetch_next(self) -> None:
+        if self._pages:
+            last = self._pages[-1][-1]
+            key = (last["due"], last["kind"], last["id"])
+        else:
+            key = (datetime.datetime.min, "", 0)
+
+        # one extra row tells us whether there is another page
+        records = await self.pool.fetch(self.query, self.user_id, *key, self.per_page + 1)
+        if len(records) <= self.per_page:
+            self._max_pages = len(self._pages) + (1 if records else 0)
+        if records:
+            self._pages.append(records[:self.per_page])
+
+    async def get_page(self, page_number: int) -> list[asyncpg.Record]:
+        while len(self._pages) <= page_number and self._max_pages is None:
+            await self._fetch_next()
+
+        if page_number >= len(self._pages):
+            raise IndexError(page_number)
+        return self._pages[page_number]
+
+    def get_max_pages(self) -> Optional[int]:
+        return self._max_pages
+
+    def is_paginating(self) -> bool:
+        return True
+
+    async def format_page(self, menu: menus.MenuPages, page: list[asyncpg.Record]) -> discord.Embed:
+        icons = {
+            "task": "\N{SPIRAL NOTE PAD}",
+            "reminder": "\N{ALARM CLOCK}",
+        }
+        titles, values = [], []
+        for record in page:
+            titles.append(f"{icons[record['kind']]} {textwrap.shorten(record['title'] or '...', width=200)}")
+            values.append(f"{record['kind'].capitalize()} {record['id']} - {format_dt(record['due'], 'R')}")
+
+        return embed(
+            title="Your agenda",
+            fieldstitle=titles,
+            fieldsval=values,
+            fieldsin=[False] * len(titles),
+            footer=f"Page {menu.current_page + 1}{f'/{self._max_pages}' if self._max_pages else ''}",
+            color=MessageColors.music())
+
+
 class TaskReminders(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)
 
     @discord.ui.button(emoji="\N{HEAVY CHECK MARK}", label="Completed", style=discord.ButtonStyle.green, custom_id="task-completed")
     async def completed(self, interaction: discord.Interaction, button: discord.ui.Button):
-        pool = interaction.client.pool  # type: ignore
+        cog: TaskTracker = interaction.client.get_cog("TaskTracker")  # type: ignore
         if interaction.message and interaction.message.embeds[0].footer.text:
-            task_id = interaction.message.embeds[0].footer.text.split(' ')[-1]
-            await pool.execute("UPDATE taskstracked SET completed = true WHERE id = $1", int(task_id))
+            task_id = int(interaction.message.embeds[0].footer.text.split(' ')[-1])
+            await cog.set_completed(interaction.user.id, [task_id], [task_id], guild_id=interaction.guild_id)
             log.info(f"Task {task_id} marked as completed")
         await interaction.response.send_message("Task marked as completed")
 
@@ -146,6 +342,43 @@ class Task:
         return f"<Task id={self.id} name={self.name} interval={self.interval}>"
 
 
+class TaskStats:
+    __slots__ = ("task_id", "user_id", "current_streak", "best_streak", "total_completed", "total_missed",)
+
+    def __init__(self, *, record: asyncpg.Record) -> None:
+        self.task_id: int = record["task_id"]
+        self.user_id: int = record["user_id"]
+        self.current_streak: int = record["current_streak"]
+        self.best_streak: int = record["best_streak"]
+        self.total_completed: int = record["total_completed"]
+        self.total_missed: int = record["total_missed"]
+
+    @classmethod
+    def empty(cls, task: Task) -> TaskStats:
+        pseudo = {
+            "task_id": task.id,
+            "user_id": task.user_id,
+            "current_streak": 0,
+            "best_streak": 0,
+            "total_completed": 0,
+            "total_missed": 0,
+        }
+        return cls(record=pseudo)  # type: ignore
+
+    @property
+    def total(self) -> int:
+        return self.total_completed + self.total_missed
+
+    @property
+    def completion_rate(self) -> float:
+        if self.total == 0:
+            return 0.0
+        return self.total_completed / self.total
+
+    def __repr__(self) -> str:
+        return f"<TaskStats task_id={self.task_id} current_streak={self.current_streak} best_streak={self.best_streak}>"
+
+
 class TaskConverter(commands.Converter, app_commands.Transformer):
     async def convert(self, ctx: Context, argument: str) -> Task:
         cog: TaskTracker = ctx.cog  # type: ignore
@@ -180,11 +413,193 @@ class TaskConverter(commands.Converter, app_commands.Transformer):
         return autocomplete([app_commands.Choice(name=g.name, value=str(g.id)) for g in tasks], value)
 
 
+class TasksConverter(commands.Converter, app_commands.Transformer):
+    """Converts a comma separated list of task IDs or names."""
+
+    @staticmethod
+    def resolve(tasks: list[Task], argument: str) -> list[Task]:
+        found: dict[int, Task] = {}
+        for part in argument.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                task = next(g for g in tasks if str(g.id) == part)
+            except StopIteration:
+                try:
+                    task = next(g for g in tasks if str(g.name) == part)
+                except StopIteration:
+                    raise commands.BadArgument(f"No task found for `{part}`.")
+            found[task.id] = task
+
+        if not found:
+            raise commands.BadArgument("No task found.")
+        return list(found.values())
+
+    async def convert(self, ctx: Context, argument: str) -> list[Task]:
+        cog: TaskTracker = ctx.cog  # type: ignore
+        tasks: list[Task] = await cog.get_tasks(ctx.author.id, connection=ctx.db)
+        return self.resolve(tasks, argument)
+
+    @classmethod
+    async def transform(cls, interaction: discord.Interaction, value: str) -> list[Task]:
+        cog: TaskTracker = interaction.client.get_cog("TaskTracker")  # type: ignore
+        tasks: list[Task] = await cog.get_tasks(interaction.user.id)
+        return cls.resolve(tasks, value)
+
+    @classmethod
+    async def autocomplete(cls, interaction: discord.Interaction, value: str) -> list[app_commands.Choice[str | float | int]]:
+        cog: TaskTracker = interaction.client.get_cog("TaskTracker")  # type: ignore
+        tasks: list[Task] = await cog.get_tasks(interaction.user.id)
+
+        *chosen, current = [p.strip() for p in value.split(",")]
+        prefix = "".join(f"{c}, " for c in chosen if c)
+        choices = [
+            app_commands.Choice(name=textwrap.shorten(f"{prefix}{g.name}", width=100), value=f"{prefix}{g.id}")
+            for g in tasks if str(g.id) not in chosen and len(f"{prefix}{g.id}") <= 100
+        ]
+        return autocomplete(choices, f"{prefix}{current}")
+
+
+class TaskCompletedSelect(discord.ui.Select["TaskPages"]):
+    def __init__(self) -> None:
+        super().__init__(placeholder="Select your completed tasks", min_values=0, row=1)
+
+    def update_options(self, tasks: list[Task]) -> None:
+        self.options = [
+            discord.SelectOption(label=textwrap.shorten(g.name, width=100), value=str(g.id), default=g.completed)
+            for g in tasks
+        ]
+        self.max_values = len(self.options)
+
+    async def callback(self, interaction: discord.Interaction) -> None:
+        assert self.view is not None
+        await self.view.update_completed(interaction, [int(v) for v in self.values])
+
+
+class TaskPages(paginator.RoboPages):
+    def __init__(self, source: PaginatorSource, *, ctx: Context, cog: TaskTracker):
+        self.cog: TaskTracker = cog
+        self.completed_select = TaskCompletedSelect()
+        super().__init__(source, ctx=ctx, compact=True)
+
+    def fill_items(self) -> None:
+        super().fill_items()
+        self.add_item(self.completed_select)
+
+    def _page_tasks(self, page_number: int) -> list[Task]:
+        source: PaginatorSource = self.source  # type: ignore
+        start = page_number * source.per_page
+        return source.entries[start:start + source.per_page]
+
+    def _update_labels(self, page_number: int) -> None:
+        super()._update_labels(page_number)
+        self.completed_select.update_options(self._page_tasks(page_number))
+
+    async def update_completed(self, interaction: discord.Interaction, completed_ids: list[int]) -> None:
+        tasks = self._page_tasks(self.current_page)
+        await self.cog.set_completed(interaction.user.id, [g.id for g in tasks], completed_ids, guild_id=interaction.guild_id)
+        for g in tasks:
+            g.completed = g.id in completed_ids
+        await self.show_page(interaction, self.current_page)
+
+
+class ReminderScheduler:
+    """Spreads reminder DMs for tasks that reset at the same time over a jitter
+    window and paces the sends so bursts don't run into the global rate limit."""
+
+    def __init__(self, cog: TaskTracker, *, jitter: float = 60.0, rate: float = 10.0):
+        self.cog: TaskTracker = cog
+        self.jitter: float = jitter
+        self.rate: float = rate
+        self._queue: asyncio.PriorityQueue[tuple[float, int, float, Task]] = asyncio.PriorityQueue()
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._next_send: float = 0.0
+        self._task: Optional[asyncio.Task[None]] = None
+        self.health: Optional[TaskHealth] = None
+        self.send_latencies: deque[float] = deque(maxlen=500)
+        self.delays: deque[float] = deque(maxlen=500)
+        self.sent: int = 0
+
+    def __repr__(self) -> str:
+        return f"<ReminderScheduler queued={self.queued} sent={self.sent}>"
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> asyncio.Task[None]:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.worker())
+        return self._task
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def schedule(self, task: Task) -> None:
+        now = _time.monotonic()
+        send_at = now + random.uniform(0, self.jitter)
+        self._queue.put_nowait((send_at, next(self._counter), now, task))
+        self._wakeup.set()
+
+    async def worker(self) -> None:
+        http = self.cog.bot.http
+        while True:
+            item = await self._queue.get()
+            send_at, _, queued_at, task = item
+            wait = max(send_at, self._next_send) - _time.monotonic()
+            if wait > 0:
+                # An earlier reminder might be queued while we sleep
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                else:
+                    self._queue.put_nowait(item)
+                    continue
+
+            await http._global_over.wait()
+            start = _time.monotonic()
+            self._next_send = start + 1 / self.rate
+            try:
+                await self.cog.send_reminder(task)
+            except Exception as e:
+                log.error(f"Failed to send reminder for task {task.id}", exc_info=e)
+            finally:
+                end = _time.monotonic()
+                self.send_latencies.append(end - start)
+                self.delays.append(end - queued_at)
+                self.sent += 1
+                if self.health is not None:
+                    self.health.tick()
+
+    @staticmethod
+    def _percentile(values: deque[float], percent: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent))]
+
+    def report(self) -> str:
+        return (f"Reminders Queued: {self.queued}, Sent: {self.sent}, "
+                f"Send Latency p50/p95: {self._percentile(self.send_latencies, 0.5) * 1000:,.0f}/{self._percentile(self.send_latencies, 0.95) * 1000:,.0f} ms, "
+                f"Delay p95: {self._percentile(self.delays, 0.95):,.1f}s")
+
+
 class TaskTracker(commands.Cog):
     def __init__(self, bot: AutoShardedBot):
         self.bot: AutoShardedBot = bot
 
         self.views_loaded = False
+        self.reminders = ReminderScheduler(
+            self,
+            jitter=getattr(bot.config, "reminder_jitter", 60.0),
+            rate=getattr(bot.config, "reminder_rate", 10.0),
+        )
 
     def __repr__(self) -> str:
         return f"<cogs.{self.__cog_name__}>"
@@ -193,6 +608,14 @@ class TaskTracker(commands.Cog):
         if not self.views_loaded:
             self.views_loaded = True
             self.bot.add_view(TaskReminders())
+        registry = self.bot.task_registry
+        self.reminders.health = registry.register("tasks.reminder_scheduler", self.reminders.start())
+        self._reconcile_task = self.bot.loop.create_task(self.reconcile_timers_loop())
+        registry.register("tasks.reconcile_timers", self._reconcile_task)
+
+    async def cog_unload(self) -> None:
+        self.reminders.stop()
+        self._reconcile_task.cancel()
 
     @cache()
     async def get_tasks(self, user_id: int, *, connection: asyncpg.Connection = None) -> list[Task]:
@@ -204,52 +627,282 @@ class TaskTracker(commands.Cog):
             to_return.append(Task(record=record))
         return sorted(to_return, key=lambda x: x.next_reset())
 
-    @commands.Cog.listener()
-    async def on_task_reset_timer_complete(self, timer: Timer):
-        user_id, task_id = timer.args
-        await self.bot.wait_until_ready()
+    async def set_completed(
+        self,
+        user_id: int,
+        task_ids: Sequence[int],
+        completed_ids: Sequence[int],
+        *,
+        guild_id: Optional[int] = None,
+        connection: asyncpg.Connection = None,
+    ) -> None:
+        """Marks every task in ``task_ids`` as completed if it is also in ``completed_ids``
+        and as not completed otherwise, in a single query.
+
+        Newly completed tasks are counted towards the week's leaderboard of
+        ``guild_id`` when one is given. Unchecking a task takes the point back
+        from the guild and week that counted it, if any."""
+        conn = connection or self.bot.pool
+        query = """WITH old AS (
+                     SELECT id, completed_guild_id, completed_week FROM taskstracked
+                     WHERE id = ANY($1::bigint[]) AND user_id = $3
+                     AND completed IS DISTINCT FROM (id = ANY($2::bigint[]))
+                     FOR UPDATE
+                   ), changed AS (
+                     UPDATE taskstracked t SET
+                       completed = (t.id = ANY($2::bigint[])),
+                       completed_guild_id = CASE WHEN t.id = ANY($2::bigint[]) THEN $4::bigint END,
+                       completed_week = CASE WHEN t.id = ANY($2::bigint[]) THEN date_trunc('week', now() at time zone 'utc')::date END
+                     FROM old
+                     WHERE t.id = old.id
+                     RETURNING t.completed, t.completed_guild_id, t.completed_week, old.completed_guild_id AS old_guild_id, old.completed_week AS old_week
+                   ), deltas AS (
+                     SELECT guild_id, week, SUM(delta) AS delta FROM (
+                       SELECT completed_guild_id AS guild_id, completed_week AS week, 1 AS delta FROM changed
+                       WHERE completed AND completed_guild_id IS NOT NULL
+                       UNION ALL
+                       SELECT old_guild_id, old_week, -1 FROM changed
+                       WHERE NOT completed AND old_guild_id IS NOT NULL
+                     ) AS d
+                     GROUP BY guild_id, week
+                   ), removed AS (
+                     UPDATE taskcompletions c SET completions = GREATEST(0, c.completions + d.delta)
+                     FROM deltas d
+                     WHERE c.guild_id = d.guild_id AND c.user_id = $3 AND c.week = d.week AND d.delta < 0
+                   )
+                   INSERT INTO taskcompletions AS c (guild_id, user_id, week, completions)
+                   SELECT guild_id, $3, week, delta FROM deltas WHERE delta > 0
+                   ON CONFLICT (guild_id, user_id, week) DO UPDATE SET
+                     completions = c.completions + EXCLUDED.completions;"""
+        await conn.execute(query, list(task_ids), list(completed_ids), user_id, guild_id)
+        self.get_tasks.invalidate(self, user_id)
+
+    async def get_leaderboard(self, guild_id: int, *, limit: int = 10, connection: asyncpg.Connection = None) -> list[asyncpg.Record]:
+        conn = connection or self.bot.pool
+        query = """SELECT user_id, completions FROM taskcompletions
+                   WHERE guild_id = $1 AND week = date_trunc('week', now() at time zone 'utc')::date
+                   AND completions > 0
+                   ORDER BY completions DESC
+                   LIMIT $2;"""
+        return await conn.fetch(query, guild_id, limit)
+
+    async def reconcile_timers(self) -> None:
+        """Recreates the task_reset timers of tasks that have lost theirs and
+        applies any resets that were missed in the meantime."""
+        # Tasks resetting within the grace window may have an in-memory
+        # short timer or a reset handler still running, so they're skipped,
+        # as are tasks locked by a reset handler that is applying its reset
+        query = """WITH missing AS (
+                     SELECT t.id, t.user_id, t.completed, t.interval, t.reset_datetime
+                     FROM taskstracked t
+                     WHERE NOT EXISTS (
+                       SELECT 1 FROM reminders r
+                       WHERE r.event = 'task_reset' AND r.extra #>> '{args,1}' = t.id::text
+                     )
+                     AND t.reset_datetime NOT BETWEEN $1::timestamp - $2::interval AND $1::timestamp + $2::interval
+                     FOR UPDATE OF t SKIP LOCKED
+                   ), overdue AS (
+                     UPDATE taskstracked t SET
+                       completed = false,
+                       last_reset = m.reset_datetime + m.interval * GREATEST(1, CEIL(EXTRACT(EPOCH FROM ($1 - m.reset_datetime)) / EXTRACT(EPOCH FROM m.interval)))::int
+                     FROM missing m
+                     WHERE t.id = m.id AND m.reset_datetime < $1
+                     RETURNING t.id, t.user_id, t.reset_datetime, m.reset_datetime AS missed_reset, m.completed AS was_completed
+                   ), history AS (
+                     INSERT INTO taskhistory (task_id, user_id, reset, completed)
+                     SELECT id, user_id, missed_reset, was_completed FROM overdue
+                   ), streaks AS (
+                     INSERT INTO taskstreaks AS s (task_id, user_id, current_streak, best_streak, total_completed, total_missed)
+                     SELECT id, user_id, was_completed::int, was_completed::int, was_completed::int, (NOT was_completed)::int FROM overdue
+                     ON CONFLICT (task_id) DO UPDATE SET
+                       current_streak = CASE WHEN EXCLUDED.total_completed = 1 THEN s.current_streak + 1 ELSE 0 END,
+                       best_streak = GREATEST(s.best_streak, CASE WHEN EXCLUDED.total_completed = 1 THEN s.current_streak + 1 ELSE 0 END),
+                       total_completed = s.total_completed + EXCLUDED.total_completed,
+                       total_missed = s.total_missed + EXCLUDED.total_missed
+                   ), timers AS (
+                     INSERT INTO reminders (event, extra, expires, created)
+                     SELECT 'task_reset', jsonb_build_object('args', jsonb_build_array(x.user_id, x.id), 'kwargs', '{}'::jsonb), x.expires, $1
+                     FROM (
+                       SELECT id, user_id, reset_datetime AS expires FROM overdue
+                       UNION ALL
+                       SELECT id, user_id, reset_datetime FROM missing WHERE reset_datetime > $1
+                     ) AS x
+                     RETURNING expires
+                   )
+                   SELECT (SELECT COUNT(*) FROM timers) AS timers,
+                          (SELECT MIN(expires) FROM timers) AS earliest,
+                          (SELECT array_agg(DISTINCT user_id) FROM overdue) AS reset_users;"""
 
+        now: NDT = discord.utils.utcnow().replace(tzinfo=None)  # type: ignore
         async with self.bot.pool.acquire(timeout=300.0) as conn:
-            record = await conn.fetchrow("UPDATE taskstracked SET completed = false WHERE id = $1 RETURNING *", task_id)
+            async with conn.transaction():
+                record = await conn.fetchrow(query, now, datetime.timedelta(minutes=5))
+
+        total, earliest, reset_users = record["timers"], record["earliest"], record["reset_users"] or []
+        for user_id in reset_users:
             self.get_tasks.invalidate(self, user_id)
-            if record is None:
-                return
 
-            task = Task(record=record)
+        if total == 0:
+            return
 
-            record = await conn.fetchrow("UPDATE taskstracked SET last_reset = $1 WHERE id = $2 RETURNING *", task.next_reset(), task.id)
-            task = Task(record=record)
+        log.warning(f"Recreated {total} missing task reset timers, {len(reset_users)} users had overdue resets applied")
+        reminder = self.bot.reminder
+        if reminder is not None:
+            reminder.reschedule(earliest, now=now)
 
-            reminder = self.bot.reminder
-            while reminder is None:
-                await asyncio.sleep(0.5)
+    async def reconcile_timers_loop(self) -> None:
+        # timers that expired while the bot was offline are dispatched first,
+        # otherwise their tasks would look like they lost their timers
+        await self.bot.wait_until_ready()
+        reminder = self.bot.reminder
+        if reminder is not None:
+            await reminder.wait_until_caught_up()
 
-            await reminder.create_timer(task.next_reset(aware=True), "task_reset", user_id, task_id, connection=conn)
+        while not self.bot.is_closed():
+            try:
+                await self.reconcile_timers()
+            except (OSError, asyncpg.PostgresError) as e:
+                log.error("Failed to reconcile task reset timers", exc_info=e)
+                self.bot.task_registry.fail("tasks.reconcile_timers", e)
+            else:
+                self.bot.task_registry.tick("tasks.reconcile_timers")
+            await asyncio.sleep(RECONCILE_INTERVAL)
+
+    async def get_task_stats(self, task: Task, *, connection: asyncpg.Connection = None) -> TaskStats:
+        conn = connection or self.bot.pool
+        record = await conn.fetchrow("SELECT * FROM taskstreaks WHERE task_id = $1", task.id)
+        if record is None:
+            return TaskStats.empty(task)
+        return TaskStats(record=record)
+
+    async def record_reset(self, task_id: int, user_id: int, completed: bool, reset: NDT, *, connection: asyncpg.Connection) -> None:
+        """Appends a history row for a reset and updates the streak counters for the task."""
+        query = "INSERT INTO taskhistory (task_id, user_id, reset, completed) VALUES ($1, $2, $3, $4);"
+        await connection.execute(query, task_id, user_id, reset, completed)
+
+        # $3 is declared boolean at its first use, otherwise it's inferred from the first ::int cast
+        query = """INSERT INTO taskstreaks AS s (task_id, user_id, current_streak, best_streak, total_completed, total_missed)
+                   VALUES ($1, $2, $3::boolean::int, $3::boolean::int, $3::boolean::int, (NOT $3::boolean)::int)
+                   ON CONFLICT (task_id) DO UPDATE SET
+                     current_streak = CASE WHEN $3::boolean THEN s.current_streak + 1 ELSE 0 END,
+                     best_streak = GREATEST(s.best_streak, CASE WHEN $3::boolean THEN s.current_streak + 1 ELSE 0 END),
+                     total_completed = s.total_completed + $3::boolean::int,
+                     total_missed = s.total_missed + (NOT $3::boolean)::int;"""
+        await connection.execute(query, task_id, user_id, completed)
 
-        if not task.remind_me:
-            return
+    @cache()
+    async def get_dm_channel(self, user_id: int, *, connection: asyncpg.Connection = None) -> Optional[asyncpg.Record]:
+        conn = connection or self.bot.pool
+        return await conn.fetchrow("SELECT * FROM dmchannels WHERE user_id = $1", user_id)
 
-        try:
-            user = self.bot.get_user(user_id) or (await self.bot.fetch_user(user_id))
-        except discord.HTTPException as e:
-            log.error(f"Failed to get user {user_id} for task {task_id}.", exc_info=e)
+    async def close_dms(self, user_id: int) -> None:
+        """Marks a user's DMs as closed and turns off reminders for all of their tasks."""
+        async with self.bot.pool.acquire(timeout=300.0) as conn:
+            async with conn.transaction():
+                await conn.execute("UPDATE dmchannels SET closed = true WHERE user_id = $1", user_id)
+                await conn.execute("UPDATE taskstracked SET remind_me = false WHERE user_id = $1 AND remind_me", user_id)
+        self.get_dm_channel.invalidate(self, user_id)
+        self.get_tasks.invalidate(self, user_id)
+
+    async def reopen_dms(self, user_id: int, *, connection: asyncpg.Connection = None) -> None:
+        conn = connection or self.bot.pool
+        status = await conn.execute("UPDATE dmchannels SET closed = false WHERE user_id = $1 AND closed", user_id)
+        if status != "UPDATE 0":
+            self.get_dm_channel.invalidate(self, user_id)
+
+    async def send_reminder(self, task: Task) -> None:
+        user_id = task.user_id
+        record = await self.get_dm_channel(user_id)
+        if record is not None and record["closed"]:
             return
 
+        if record is None:
+            try:
+                user = self.bot.get_user(user_id) or (await self.bot.fetch_user(user_id))
+                dm = await user.create_dm()
+            except discord.HTTPException as e:
+                log.error(f"Failed to open a DM with user {user_id} for task {task.id}.", exc_info=e)
+                return
+
+            query = """INSERT INTO dmchannels (user_id, channel_id) VALUES ($1, $2)
+                       ON CONFLICT (user_id) DO UPDATE SET channel_id = EXCLUDED.channel_id;"""
+            await self.bot.pool.execute(query, user_id, dm.id)
+            self.get_dm_channel.invalidate(self, user_id)
+            channel_id = dm.id
+        else:
+            channel_id = record["channel_id"]
+
+        channel = self.bot.get_partial_messageable(channel_id, type=discord.ChannelType.private)
         try:
-            await user.send(embed=embed(
+            await channel.send(embed=embed(
                 title=f"Your `{task.name}` has been reset",
                 footer=f"Task ID: {task.id}",
                 description=f"Don't forget to mark this as completed when you're done :)\n\nYour next reminder is {format_dt(task.next_reset(),style='R')}"),
                 view=TaskReminders())
         except discord.Forbidden:
-            await self.bot.pool.execute("UPDATE taskstracked SET remind_me = false WHERE id = $1", task.id)
-            self.get_tasks.invalidate(self, user_id)
-            log.error(f"Couldn't send reminder to {user_id} for task {task_id}")
+            await self.close_dms(user_id)
+            log.error(f"Couldn't send reminder to {user_id} for task {task.id}, disabled reminders for all of their tasks")
+        except discord.NotFound:
+            await self.bot.pool.execute("DELETE FROM dmchannels WHERE user_id = $1", user_id)
+            self.get_dm_channel.invalidate(self, user_id)
+            log.error(f"DM channel {channel_id} for {user_id} no longer exists, task {task.id}")
         except discord.HTTPException as e:
-            log.error(f"Failed to send reminder to {user_id} for task {task_id}.", exc_info=e)
-            return
+            log.error(f"Failed to send reminder to {user_id} for task {task.id}.", exc_info=e)
         else:
-            log.info(f"Sent reminder to {user} for task {task.id}")
+            log.info(f"Sent reminder to {user_id} for task {task.id}")
+
+    @commands.Cog.listener()
+    async def on_task_reset_timer_complete(self, timer: Timer):
+        user_id, task_id = timer.args
+        await self.bot.wait_until_ready()
+
+        reminder = self.bot.reminder
+        while reminder is None:
+            await asyncio.sleep(0.5)
+            reminder = self.bot.reminder
+
+        # The reset, the new last_reset and the next timer are written under one
+        # row lock so reconcile_timers can't apply the same reset in between.
+        # A task whose reset_datetime is already past this timer was reset by
+        # reconcile_timers while the timer was being dispatched, so it's skipped.
+        async with self.bot.pool.acquire(timeout=300.0) as conn:
+            async with conn.transaction():
+                query = """UPDATE taskstracked t SET completed = false
+                           FROM (SELECT id, completed FROM taskstracked WHERE id = $1 AND reset_datetime <= $2 FOR UPDATE) AS old
+                           WHERE t.id = old.id
+                           RETURNING t.*, old.completed AS was_completed;"""
+                record = await conn.fetchrow(query, task_id, timer.expires)
+                if record is not None:
+                    await self.record_reset(record["id"], record["user_id"], record["was_completed"], timer.expires, connection=conn)
+
+                    task = Task(record=record)
+                    record = await conn.fetchrow("UPDATE taskstracked SET last_reset = $1 WHERE id = $2 RETURNING *", task.next_reset(), task.id)
+                    task = Task(record=record)
+                    new_timer = await reminder.create_timer(task.next_reset(aware=True), "task_reset", user_id, task_id, connection=conn)
+
+        # invalidated after the commit so a concurrent lookup can't cache the row from before the reset
+        self.get_tasks.invalidate(self, user_id)
+        if record is None:
+            return
+
+        # create_timer woke the dispatcher before the timer was committed
+        reminder.reschedule(new_timer.expires)
+
+        if not task.remind_me:
+            return
+
+        self.reminders.schedule(task)
+
+    @commands.hybrid_command(name="agenda", aliases=["upcoming"])
+    async def agenda(self, ctx: Context):
+        """Shows your upcoming tasks and reminders together"""
+        source = AgendaPageSource(self.bot.pool, ctx.author.id)
+        await source._prepare_once()
+        if source.empty:
+            return await ctx.send("You don't have anything coming up.", ephemeral=True)
+
+        pages = paginator.RoboPages(source=source, ctx=ctx, compact=True)
+        await pages.start()
 
     @commands.hybrid_group(fallback="display", invoke_without_command=True, case_insensitive=True)
     async def tasks(self, ctx: Context, *, task: app_commands.Transform[Optional[Task], TaskConverter] = None):
@@ -267,7 +920,7 @@ class TaskTracker(commands.Cog):
             return await ctx.send("You don't have any tasks yet")
 
         source = PaginatorSource(entries=tasks)
-        pages = paginator.RoboPages(source=source, ctx=ctx, compact=True)
+        pages = TaskPages(source, ctx=ctx, cog=self)
 
         await pages.start()
 
@@ -298,16 +951,177 @@ class TaskTracker(commands.Cog):
         record = await ctx.db.fetchrow("INSERT INTO taskstracked (user_id, name, interval, last_reset, time, remind_me) VALUES ($1, $2, $3, $4, $5, $6) RETURNING *", ctx.author.id, task_name, resets_every.interval, dt, dt.time(), remind_me)
         task = Task(record=record)
         await reminder.create_timer(task.next_reset(aware=True), "task_reset", ctx.author.id, task.id)
+        if remind_me:
+            await self.reopen_dms(ctx.author.id, connection=ctx.db)
         self.get_tasks.invalidate(self, ctx.author.id)
         await ctx.send(f"Added task `{task_name}`, this task will reset once per `{human_timedelta(ctx.message.created_at + resets_every.interval, source=ctx.message.created_at)}` at `{start_time.dt}`. The next reset is {format_dt(task.next_reset(), style='R')}")
 
     @tasks.command(name="check", aliases=["done", "complete", "finish"])
     async def tasks_check(self, ctx: Context, task: app_commands.Transform[Task, TaskConverter], check: Optional[bool] = True):
         """Check off a task for the set interval"""
-        await ctx.db.execute("UPDATE taskstracked SET completed = $1 WHERE id = $2", check, task.id)
-        self.get_tasks.invalidate(self, ctx.author.id)
+        await self.set_completed(ctx.author.id, [task.id], [task.id] if check else [], guild_id=ctx.guild and ctx.guild.id, connection=ctx.db)
         await ctx.send(f"task `{task.name}` completed!")
 
+    @tasks.command(name="checkmany", aliases=["bulkcheck"])
+    @app_commands.describe(tasks="The tasks to check off, separated by commas")
+    async def tasks_checkmany(self, ctx: Context, tasks: app_commands.Transform[List[Task], TasksConverter], check: Optional[bool] = True):
+        """Check off multiple tasks at once"""
+        ids = [task.id for task in tasks]
+        await self.set_completed(ctx.author.id, ids, ids if check else [], guild_id=ctx.guild and ctx.guild.id, connection=ctx.db)
+        names = ", ".join(f"`{task.name}`" for task in tasks)
+        await ctx.send(f"tasks {names} {'completed' if check else 'unchecked'}!")
+
+    @tasks.command(name="leaderboard", aliases=["lb", "top"])
+    @commands.guild_only()
+    async def tasks_leaderboard(self, ctx: GuildContext):
+        """Shows who has completed the most tasks in this server this week"""
+        records = await self.get_leaderboard(ctx.guild.id, connection=ctx.db)
+        if len(records) == 0:
+            return await ctx.send("No one has completed any tasks in this server this week.", ephemeral=True)
+
+        medals = ("\N{FIRST PLACE MEDAL}", "\N{SECOND PLACE MEDAL}", "\N{THIRD PLACE MEDAL}")
+        lines = []
+        for index, (user_id, completions) in enumerate(records):
+            place = medals[index] if index < len(medals) else f"`#{index + 1}`"
+            lines.append(f"{place} <@{user_id}> - {completions} task{'s' if completions != 1 else ''}")
+
+        await ctx.send(embed=embed(
+            title=f"Task leaderboard for {ctx.guild.name}",
+            description="\n".join(lines),
+            footer="Resets every Monday (UTC)",
+            color=MessageColors.music()), allowed_mentions=discord.AllowedMentions.none())
+
+    @tasks.command(name="import")
+    @app_commands.describe(file="A CSV or JSON file with `name`, `interval`, `time` and `remind_me` columns")
+    async def tasks_import(self, ctx: Context, file: discord.Attachment):
+        """Import tasks from a CSV or JSON file"""
+        reminder = self.bot.reminder
+        if reminder is None:
+            return await ctx.send(ctx.lang["errors"]["missing_functionality"], ephemeral=True)
+
+        if file.size > MAX_IMPORT_SIZE:
+            return await ctx.send(f"That file is too large, the limit is {MAX_IMPORT_SIZE // 1024**2} MiB.", ephemeral=True)
+
+        filename = file.filename.lower()
+        if not filename.endswith((".csv", ".json", ".jsonl", ".ndjson")):
+            return await ctx.send("Only `.csv` and `.json` files can be imported.", ephemeral=True)
+
+        await ctx.defer()
+        timezone = ctx.timezone
+        now: ADT = discord.utils.utcnow().astimezone(timezone)  # type: ignore
+
+        # Spool the download so large files end up on disk instead of the heap
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode="w+", encoding="utf-8", newline="") as fp:
+            decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+            async with self.bot.session.get(file.url) as resp:
+                resp.raise_for_status()
+                async for chunk in resp.content.iter_chunked(65536):
+                    fp.write(decoder.decode(chunk))
+            fp.write(decoder.decode(b"", final=True))
+            fp.seek(0)
+
+            rows = csv.DictReader(fp) if filename.endswith(".csv") else iter_json_objects(fp)
+
+            def records() -> Iterator[tuple[str, datetime.timedelta, NDT, NT, bool]]:
+                for number, row in enumerate(rows, start=1):
+                    if number > MAX_IMPORT_TASKS:
+                        raise commands.BadArgument(f"You can only import up to {MAX_IMPORT_TASKS} tasks at a time.")
+                    try:
+                        yield parse_import_row(row, now=now, timezone=timezone)
+                    except commands.BadArgument as e:
+                        raise commands.BadArgument(f"Row {number}: {e}") from e
+
+            query = """WITH inserted AS (
+                         INSERT INTO taskstracked (user_id, name, interval, last_reset, time, remind_me)
+                         SELECT $1, name, interval, last_reset, time, remind_me FROM task_import
+                         RETURNING id, reset_datetime
+                       ), timers AS (
+                         INSERT INTO reminders (event, extra, expires, created)
+                         SELECT 'task_reset', jsonb_build_object('args', jsonb_build_array($1::bigint, id), 'kwargs', '{}'::jsonb), reset_datetime, $2
+                         FROM inserted
+                         RETURNING expires
+                       )
+                       SELECT COUNT(*) AS total, MIN(expires) AS earliest FROM timers;"""
+
+            async with ctx.acquire():
+                async with ctx.db.transaction():
+                    await ctx.db.execute("""CREATE TEMPORARY TABLE task_import (
+                                              name text NOT NULL,
+                                              interval interval NOT NULL,
+                                              last_reset timestamp NOT NULL,
+                                              time time NOT NULL,
+                                              remind_me boolean NOT NULL
+                                            ) ON COMMIT DROP;""")
+                    await ctx.db.copy_records_to_table("task_import", records=records(), columns=("name", "interval", "last_reset", "time", "remind_me"))
+                    result = await ctx.db.fetchrow(query, ctx.author.id, now.astimezone(datetime.timezone.utc).replace(tzinfo=None))
+                    await self.reopen_dms(ctx.author.id, connection=ctx.db)
+
+        self.get_tasks.invalidate(self, ctx.author.id)
+        total, earliest = result["total"], result["earliest"]
+        if total == 0:
+            return await ctx.send("No tasks found in that file.", ephemeral=True)
+
+        reminder.reschedule(earliest)
+        await ctx.send(f"Imported {total} task{'s' if total != 1 else ''}.")
+
+    @tasks.command(name="export")
+    @app_commands.describe(file_format="The format of the exported file")
+    async def tasks_export(self, ctx: Context, file_format: Literal["csv", "json"] = "csv"):
+        """Export your tasks to a file"""
+        timezone = ctx.timezone
+        today = discord.utils.utcnow().date()
+        query = "SELECT name, interval, time, remind_me FROM taskstracked WHERE user_id = $1 ORDER BY id;"
+
+        fp = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        total = 0
+        if file_format == "csv":
+            writer.writerow(EXPORT_COLUMNS)
+        else:
+            buffer.write("[")
+
+        async with ctx.acquire():
+            async with ctx.db.transaction():
+                async for record in ctx.db.cursor(query, ctx.author.id, prefetch=100):
+                    local = datetime.datetime.combine(today, record["time"], tzinfo=datetime.timezone.utc).astimezone(timezone)
+                    row = (record["name"], format_interval(record["interval"]), local.strftime("%H:%M"), record["remind_me"])
+                    if file_format == "csv":
+                        writer.writerow(row)
+                    else:
+                        buffer.write(("," if total else "") + "\n" + json.dumps(dict(zip(EXPORT_COLUMNS, row))))
+                    total += 1
+                    fp.write(buffer.getvalue().encode("utf-8"))
+                    buffer.seek(0)
+                    buffer.truncate()
+
+        if total == 0:
+            fp.close()
+            return await ctx.send("You don't have any tasks yet", ephemeral=True)
+
+        if file_format == "json":
+            buffer.write("\n]\n")
+        fp.write(buffer.getvalue().encode("utf-8"))
+        fp.seek(0)
+        await ctx.send(f"Exported {total} task{'s' if total != 1 else ''}.", file=discord.File(fp, filename=f"tasks.{file_format}"), ephemeral=True)  # type: ignore
+
+    @tasks.command(name="stats", aliases=["streak", "streaks"])
+    async def tasks_stats(self, ctx: Context, *, task: app_commands.Transform[Task, TaskConverter]):
+        """Shows your streaks and completion history for a task"""
+        stats = await self.get_task_stats(task, connection=ctx.db)
+        await ctx.send(embed=embed(
+            title=f"Stats for `{task.name}`",
+            fieldstitle=["Current streak", "Best streak", "Completed", "Missed", "Completion rate"],
+            fieldsval=[
+                stats.current_streak,
+                stats.best_streak,
+                stats.total_completed,
+                stats.total_missed,
+                f"{stats.completion_rate:.0%}",
+            ],
+            footer=f"Task ID: {task.id}",
+            color=MessageColors.music()))
+
     @tasks.command(name="change", aliases=["modify"])
     async def tasks_change(
         self,
@@ -332,10 +1146,6 @@ class TaskTracker(commands.Cog):
             options.append(f"interval = ${x}")
             params.append(resets_every and resets_every.interval)
             x += 1
-        if completed is not None:
-            options.append(f"completed = ${x}")
-            params.append(completed)
-            x += 1
         if start_time is not None:
             options.append(f"time = ${x}")
             params.append(start_time and start_time.time)
@@ -348,14 +1158,19 @@ class TaskTracker(commands.Cog):
             options.append(f"name = ${x}")
             params.append(task_name)
             x += 1
-        query += ", ".join(options)
-        query += f" WHERE id = ${len(options) + 1}"
-
-        await ctx.db.execute(
-            query,
-            *params,
-            task.id
-        )
+        if options:
+            query += ", ".join(options)
+            query += f" WHERE id = ${len(options) + 1}"
+
+            await ctx.db.execute(
+                query,
+                *params,
+                task.id
+            )
+        if completed is not None:
+            await self.set_completed(ctx.author.id, [task.id], [task.id] if completed else [], guild_id=ctx.guild and ctx.guild.id, connection=ctx.db)
+        if remind_me:
+            await self.reopen_dms(ctx.author.id, connection=ctx.db)
         self.get_tasks.invalidate(self, ctx.author.id)
         await ctx.send(f"task `{task.name}` changed!", ephemeral=True)
 
@@ -371,11 +1186,10 @@ class TaskTracker(commands.Cog):
         await ctx.db.execute(query, task.id, ctx.author.id)
         query = """DELETE FROM reminders
                 WHERE event='task_reset'
-                AND extra #>> '{args,0}' = $1 RETURNING id;"""
-        timer_id = await ctx.db.fetchval(query, task.id)
+                AND extra #>> '{args,1}' = $1 RETURNING id;"""
+        timer_id = await ctx.db.fetchval(query, str(task.id))
         if reminder._current_timer and reminder._current_timer.id == timer_id:
-            reminder._task.cancel()
-            reminder._task = self.bot.loop.create_task(reminder.dispatch_timers())
+            reminder.restart_dispatcher()
 
         self.get_tasks.invalidate(self, ctx.author.id)
         await ctx.send(f"task `{task.name}` deleted!", ephemeral=True)
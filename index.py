@@ -19,9 +19,13 @@ import cogs
 import config
 from utils.config import Config, ReadOnly
 from utils.context import Context
-from utils.db import Table
+from utils.db import QueryStats, Table, current_query_stats
+from utils.errors import ErrorAggregator
+from utils.health import TaskRegistry
+from utils.rolling import RollingCounter, ShardStats
 from utils.logging import setup_logging
 from utils.time import human_timedelta
+from utils.watchdog import LoopWatchdog
 
 if TYPE_CHECKING:
     from cogs.reminder import Reminder
@@ -101,7 +105,11 @@ class AutoShardedBot(commands.AutoShardedBot):
     uptime: datetime.datetime
     command_stats: Counter[str]
     socket_stats: Counter[str]
+    socket_events: RollingCounter
     gateway_handler: Any
+    task_registry: TaskRegistry
+    errors: ErrorAggregator
+    watchdog: Optional[LoopWatchdog]
 
     def __init__(self, **kwargs):
         super().__init__(
@@ -116,19 +124,31 @@ class AutoShardedBot(commands.AutoShardedBot):
             **kwargs
         )
 
-        # shard_id: List[datetime.datetime]
-        # shows the last attempted IDENTIFYs and RESUMEs
-        self.resumes: defaultdict[int, list[datetime.datetime]] = defaultdict(list)
-        self.identifies: defaultdict[int, list[datetime.datetime]] = defaultdict(list)
+        # shard_id: ShardStats
+        # rolling counts of IDENTIFYs, RESUMEs and latency samples
+        self.shard_stats: defaultdict[int, ShardStats] = defaultdict(ShardStats)
 
         self.spam_control = commands.CooldownMapping.from_cooldown(10, 12.0, commands.BucketType.user)
 
+        self.task_registry = TaskRegistry()
+        self.errors = ErrorAggregator(window=getattr(config, "error_log_window", 300.0))
+        self.watchdog = None
+
         log.info(f"Cluster Starting {kwargs.get('shard_ids', None)}, {kwargs.get('shard_count', 1)}")
 
+    def _schedule_event(self, coro, event_name: str, *args: Any, **kwargs: Any) -> asyncio.Task:
+        task = super()._schedule_event(coro, event_name, *args, **kwargs)
+        self.task_registry.track_event(task)
+        return task
+
     def __repr__(self) -> str:
         return f"<Bot username=\"{self.user}\" id={self.user and self.user.id}>"
 
     async def setup_hook(self) -> None:
+        if getattr(config, "loop_watchdog", False):
+            self.watchdog = LoopWatchdog(threshold=getattr(config, "loop_watchdog_threshold", 0.1))
+            self.task_registry.register("bot.loop_watchdog", self.watchdog.start())
+
         self.session = aiohttp.ClientSession()
 
         self.bot_app_info = await self.application_info()
@@ -163,23 +183,15 @@ class AutoShardedBot(commands.AutoShardedBot):
             await self.tree.sync(guild=TESTING_SERVER)
 
     async def get_context(self, origin: discord.Message | discord.Interaction, /, *, cls=None) -> Context:
-        return await super().get_context(origin, cls=cls or Context)
-
-    def _clear_gateway_data(self) -> None:
-        one_week_ago = discord.utils.utcnow() - datetime.timedelta(days=7)
-        for _, dates in self.identifies.items():
-            to_remove = [index for index, dt in enumerate(dates) if dt < one_week_ago]
-            for index in reversed(to_remove):
-                del dates[index]
-
-        for _, dates in self.resumes.items():
-            to_remove = [index for index, dt in enumerate(dates) if dt < one_week_ago]
-            for index in reversed(to_remove):
-                del dates[index]
+        ctx = await super().get_context(origin, cls=cls or Context)
+        if ctx.command is not None:
+            # the invocation runs in this task, so every query it makes is counted
+            ctx.query_stats = QueryStats(ctx.command.qualified_name, warn_after=getattr(config, "query_warn_repeats", None))
+            current_query_stats.set(ctx.query_stats)
+        return ctx
 
     async def before_identify_hook(self, shard_id: int, *, initial: bool):
-        self._clear_gateway_data()
-        self.identifies[shard_id].append(discord.utils.utcnow())
+        self.shard_stats[shard_id].identifies.add()
         await super().before_identify_hook(shard_id, initial=initial)
 
     async def on_command_error(self, ctx: Context, error: commands.CommandError) -> None:
@@ -223,12 +235,10 @@ class AutoShardedBot(commands.AutoShardedBot):
         elif isinstance(error, commands.CommandInvokeError):
             original = error.original
             if not isinstance(original, discord.HTTPException):
-                print(f"In {ctx.command.qualified_name}:", file=sys.stderr)
-                traceback.print_tb(original.__traceback__)
-                log.error(f"{original.__class__.__name__}: {original}", sys.stderr.readline)
+                self.log_error(original, f"command {ctx.command.qualified_name}")
         else:
             if error:
-                log.error('Ignoring exception in command {}:'.format(ctx.command), exc_info=(type(error), error, error.__traceback__))
+                self.log_error(error, f"command {ctx.command}")
             # if not self.prod and not self.canary:
             #     return
             # try:
@@ -238,6 +248,15 @@ class AutoShardedBot(commands.AutoShardedBot):
             # else:
             #     log.info("ERROR sent")
 
+    def log_error(self, error: BaseException, where: str) -> bool:
+        """Logs an error in full unless the same error was logged recently, returns whether it was logged."""
+        suppressed = self.errors.record(error, where)
+        if suppressed is None:
+            return False
+        repeats = f" ({suppressed} more since it was last logged)" if suppressed else ""
+        log.error(f"Ignoring exception in {where}{repeats}:", exc_info=(type(error), error, error.__traceback__))
+        return True
+
     @overload
     def get_timezone_name(self, *priorities: Optional[int]) -> str:
         ...
@@ -299,7 +318,7 @@ class AutoShardedBot(commands.AutoShardedBot):
 
     async def on_shard_resumed(self, shard_id: int):
         log.info(f"Shard #{shard_id} has resumed")
-        self.resumes[shard_id].append(discord.utils.utcnow())
+        self.shard_stats[shard_id].resumes.add()
 
     async def on_shard_disconnect(self, shard_id: int):
         log.info(f"Shard #{shard_id} has disconnected")
@@ -342,6 +361,8 @@ class AutoShardedBot(commands.AutoShardedBot):
 
     async def close(self) -> None:
         log.info("Closing...")
+        if self.watchdog is not None:
+            self.watchdog.stop()
         await super().close()
         await self.session.close()
 
@@ -390,12 +411,32 @@ def db_init():
     asyncio.get_event_loop().close()
 
 
+def db_export(start: str, end: str, fmt: str = "csv", directory: str = "exports"):
+    from cogs.stats import export_tables, iso_date
+
+    async def export():
+        con = await asyncpg.connect(config.postgresql)
+        try:
+            return await export_tables(con, directory, iso_date(start), iso_date(end), fmt=fmt)
+        finally:
+            await con.close()
+
+    for path in asyncio.run(export()):
+        print(f"Exported {path}")
+
+
 if __name__ == "__main__":
     print(f"Python version: {sys.version}")
 
     if len(sys.argv) > 1:
         if sys.argv[1] == "--init":
             db_init()
+        elif sys.argv[1] == "--export":
+            if len(sys.argv) < 4:
+                print("Usage: index.py --export START END [csv|ndjson] [directory]")
+                sys.exit(1)
+            db_export(*sys.argv[2:6])
+            sys.exit(0)
 
     with setup_logging():
         bot = AutoShardedBot()
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+
+import pytest
+from utils.cache import ExpiringCache, Strategy, cache
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_expiring_cache_expires_lazily(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    expiring = ExpiringCache(10.0)
+    expiring["a"] = 1
+    now += 5
+    expiring["b"] = 2
+    assert expiring["a"] == 1 and "b" in expiring
+
+    now += 6
+    assert "a" not in expiring
+    assert expiring["b"] == 2
+    assert len(expiring) == 1
+
+    # setting again pushes the expiry back
+    expiring["b"] = 3
+    now += 9
+    assert expiring["b"] == 3
+
+
+async def test_expiring_cache_maxsize():
+    expiring = ExpiringCache(60.0, maxsize=3)
+    for x in range(5):
+        expiring[str(x)] = x
+    assert list(expiring) == ["2", "3", "4"]
+
+
+async def test_timed_cache_decorator():
+    calls = []
+
+    @cache(maxsize=2, strategy=Strategy.timed, ttl=60.0)
+    async def fetch(key: int) -> int:
+        calls.append(key)
+        return key * 2
+
+    assert await fetch(1) == 2
+    assert await fetch(1) == 2
+    await fetch(2)
+    await fetch(3)
+    assert await fetch(1) == 2
+    assert calls == [1, 2, 3, 1]
+
+    with pytest.raises(ValueError):
+        cache(strategy=Strategy.timed)
+
+
+class _CountingDict(OrderedDict):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+        self.popped = []
+
+    def __getitem__(self, key):
+        self.reads += 1
+        return super().__getitem__(key)
+
+    def popitem(self, last=True):
+        item = super().popitem(last=last)
+        self.popped.append(item[0])
+        return item
+
+
+async def test_expiring_cache_only_touches_expired_entries(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    expiring = ExpiringCache(10.0)
+    expiring._data = data = _CountingDict()
+    for x in range(10_000):
+        expiring[str(x)] = x
+        now += 0.001
+
+    # the first three entries are now past their expiry
+    now = 1010.0025
+    assert expiring["5000"] == 5000
+    assert data.popped == ["0", "1", "2"]
+    # one peek per expired entry, one at the first live entry, then the lookup itself
+    assert data.reads == 5
+
+
+async def test_concurrent_misses_share_one_call():
+    calls = []
+    release = asyncio.Event()
+
+    @cache()
+    async def fetch(key: int) -> int:
+        calls.append(key)
+        await release.wait()
+        return key * 2
+
+    pending = [asyncio.ensure_future(fetch(1)) for _ in range(10)]
+    other = asyncio.ensure_future(fetch(2))
+    await asyncio.sleep(0)
+    release.set()
+    assert await asyncio.gather(*pending) == [2] * 10
+    assert await other == 4
+    assert calls == [1, 2]
+    assert await fetch(1) == 2
+    assert calls == [1, 2]
+
+
+async def test_concurrent_miss_errors_propagate_and_are_not_cached():
+    calls = []
+    release = asyncio.Event()
+
+    @cache()
+    async def fetch(key: int) -> int:
+        calls.append(key)
+        await release.wait()
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return key
+
+    pending = [asyncio.ensure_future(fetch(1)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*pending, return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert calls == [1]
+
+    assert await fetch(1) == 1
+    assert calls == [1, 1]
+
+
+async def test_cancelled_caller_does_not_cancel_shared_call():
+    release = asyncio.Event()
+
+    @cache()
+    async def fetch(key: int) -> int:
+        await release.wait()
+        return key
+
+    first = asyncio.ensure_future(fetch(1))
+    second = asyncio.ensure_future(fetch(1))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    assert await second == 1
+    assert first.cancelled()
+    assert fetch.get_key(1) in fetch.cache
+
+
+async def test_invalidate_drops_in_flight_call():
+    calls = []
+    release = asyncio.Event()
+
+    @cache()
+    async def fetch(key: int) -> int:
+        calls.append(key)
+        await release.wait()
+        return len(calls)
+
+    stale = asyncio.ensure_future(fetch(1))
+    await asyncio.sleep(0)
+    fetch.invalidate(1)
+    fresh = asyncio.ensure_future(fetch(1))
+    await asyncio.sleep(0)
+    release.set()
+    assert await stale == 2
+    assert await fresh == 2
+    assert calls == [1, 1]
+    assert await fetch(1) == 2
+    assert calls == [1, 1]
+
+
+async def test_explicit_connection_is_not_shared():
+    calls = []
+    release = asyncio.Event()
+
+    @cache()
+    async def fetch(key: int, *, connection=None) -> int:
+        calls.append(connection)
+        await release.wait()
+        return key
+
+    shared = [asyncio.ensure_future(fetch(1)) for _ in range(2)]
+    own = asyncio.ensure_future(fetch(1, connection="transaction"))
+    await asyncio.sleep(0)
+    release.set()
+    assert await asyncio.gather(*shared, own) == [1, 1, 1]
+    assert calls == [None, "transaction"]
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import logging
+
+import pytest
+from utils.db import QueryStats, _status_rows
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_query_stats_warns_on_repeats(caplog):
+    stats = QueryStats("tasks check", warn_after=3)
+    with caplog.at_level(logging.WARNING, logger="utils.db"):
+        for _ in range(4):
+            stats.record("SELECT * FROM taskstracked\n   WHERE id = $1", 1, 0.01)
+        stats.record("SELECT 1", 1, 0.01)
+
+    assert stats.queries == 5 and stats.rows == 5
+    assert stats.elapsed == pytest.approx(0.05)
+    assert [r.getMessage() for r in caplog.records] == [
+        "Possible N+1 in tasks check, this statement ran 3 times: SELECT * FROM taskstracked WHERE id = $1"
+    ]
+
+
+async def test_status_rows():
+    assert _status_rows("INSERT 0 5") == 5
+    assert _status_rows("UPDATE 3") == 3
+    assert _status_rows("CREATE TABLE") == 0
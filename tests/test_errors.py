@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import pytest
+from utils.errors import ErrorAggregator, fingerprint
+
+pytestmark = pytest.mark.asyncio
+
+
+def _raise(exc: BaseException) -> BaseException:
+    try:
+        raise exc
+    except BaseException as e:
+        return e
+
+
+async def test_fingerprint_ignores_message():
+    assert fingerprint(_raise(ValueError("a"))) == fingerprint(_raise(ValueError("b")))
+    assert fingerprint(_raise(ValueError("a"))) != fingerprint(_raise(KeyError("a")))
+
+
+async def test_aggregator_logs_once_per_window():
+    errors = ErrorAggregator(window=60.0)
+    assert errors.record(_raise(ValueError("boom")), "command tasks") == 0
+    for _ in range(4):
+        assert errors.record(_raise(ValueError("boom")), "command tasks") is None
+    assert errors.record(_raise(KeyError("other")), "event on_message") == 0
+
+    (top, other) = errors.most_common()
+    assert top.count == 5 and top.suppressed == 4
+    assert top.name == "ValueError" and "boom" in top.traceback
+    assert other.where == "event on_message"
+
+    errors.window = 0.0
+    assert errors.record(_raise(ValueError("boom")), "command tasks") == 4
+
+
+async def test_aggregator_is_bounded():
+    errors = ErrorAggregator(max_size=2)
+    errors.record(_raise(ValueError()), "a")
+    errors.record(_raise(KeyError()), "b")
+    errors.record(_raise(ValueError()), "a")
+    errors.record(_raise(TypeError()), "c")
+    assert [r.name for r in errors.most_common()] == ["ValueError", "TypeError"]
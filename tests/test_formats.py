@@ -0,0 +1,12 @@
+from __future__ import annotations
+
+import pytest
+from utils.formats import sparkline
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_sparkline():
+    assert sparkline([0, 7, None, 3.5]) == "▁█ ▄"
+    assert sparkline([5, 5]) == "▁▁"
+    assert sparkline([None, None]) == "  "
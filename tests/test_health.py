@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from utils.health import TaskRegistry
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_registry_tracks_ticks_and_failures():
+    registry = TaskRegistry()
+
+    async def worker():
+        registry.tick("worker")
+        raise RuntimeError("boom")
+
+    entry = registry.register("worker", asyncio.create_task(worker()))
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert not entry.running
+    assert entry.ticks == 1 and entry.last_tick is not None
+    assert entry.failures == 1
+    assert isinstance(entry.last_exception, RuntimeError)
+
+    again = registry.register("worker", asyncio.create_task(asyncio.sleep(10)))
+    assert again is entry
+    assert entry.running and entry.restarts == 1
+    entry.task.cancel()  # type: ignore
+    await asyncio.sleep(0)
+    assert entry.failures == 1
+    assert [e.name for e in registry.snapshot()] == ["worker"]
+
+
+async def test_registry_tracks_events():
+    registry = TaskRegistry()
+    event = asyncio.Event()
+    task = asyncio.create_task(event.wait())
+    registry.track_event(task)
+    assert len(registry.events) == 1
+    event.set()
+    await task
+    await asyncio.sleep(0)
+    assert len(registry.events) == 0
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import pytest
+from utils.rolling import RollingCounter, ShardStats
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_rolling_counter_series():
+    counter = RollingCounter(5)
+    counter.add(now=0)
+    counter.add(now=30)
+    counter.add(now=130)
+    assert counter.series(3, now=150) == [2.0, 0.0, 1.0]
+    assert counter.total(5, now=150) == 3.0
+
+    # buckets that fell out of the window are reused
+    counter.add(now=300)
+    assert counter.series(5, now=300) == [0.0, 1.0, 0.0, 0.0, 1.0]
+    assert counter.total(10, now=300) == 2.0
+    assert len(counter.sums) == 5
+
+
+async def test_rolling_counter_mean():
+    counter = RollingCounter(60)
+    assert counter.mean(5, now=0) is None
+    counter.add(0.1, now=0)
+    counter.add(0.3, now=61)
+    assert counter.mean(5, now=61) == pytest.approx(0.2)
+    assert counter.mean(1, now=61) == pytest.approx(0.3)
+
+
+async def test_shard_stats_skips_infinite_latency():
+    stats = ShardStats()
+    stats.add_latency(float("inf"), now=0)
+    stats.add_latency(0.05, now=0)
+    assert stats.latency.mean(1, now=0) == pytest.approx(0.05)
+
+
+async def test_shard_stats_counts_events_from_sequence():
+    stats = ShardStats()
+    stats.add_sequence(None, now=0)
+    stats.add_sequence(100, now=0)
+    assert stats.events.total(1, now=0) == 0
+    stats.add_sequence(130, now=60)
+    # a new session starts counting from zero again
+    stats.add_sequence(12, now=120)
+    assert stats.events.series(3, now=120) == [0.0, 30.0, 12.0]
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import datetime
+
+import pytest
+from utils.sketch import SpaceSaving, TopKWindows, WindowedTopK
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_space_saving_bounded():
+    sketch: SpaceSaving[str] = SpaceSaving(3)
+    for key in "aaaaabbbcd":
+        sketch.add(key)
+    assert len(sketch) == 3
+    assert sketch.most_common(2) == [("a", 5), ("b", 3)]
+    # "d" replaced "c" and inherited its count
+    assert sketch.counts["d"] == 2
+    assert sketch.errors["d"] == 1
+
+
+async def test_windowed_top_k_expires():
+    start = datetime.datetime(2024, 1, 1)
+    top: WindowedTopK[str] = WindowedTopK(datetime.timedelta(hours=1), buckets=4)
+    top.add("old", start)
+    top.add("new", start + datetime.timedelta(minutes=50))
+    top.add("new", start + datetime.timedelta(minutes=55))
+    assert top.most_common(5, start + datetime.timedelta(minutes=59)) == [("new", 2), ("old", 1)]
+    assert top.most_common(5, start + datetime.timedelta(minutes=80)) == [("new", 2)]
+    assert top.most_common(5, start + datetime.timedelta(hours=3)) == []
+
+
+async def test_top_k_windows():
+    now = datetime.datetime(2024, 1, 1)
+    top: TopKWindows[int] = TopKWindows(capacity=10)
+    top.add(1, now - datetime.timedelta(days=2))
+    top.add(2, now)
+    assert top.most_common("hour", 5, now) == [(2, 1)]
+    assert top.most_common("week", 5, now) == [(1, 1), (2, 1)]
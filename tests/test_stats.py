@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import datetime
+import gzip
+import io
+import logging
+from collections import Counter
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import discord
+import pytest
+from cogs.stats import (MATERIALIZED_VIEWS, Commands, GatewayDigest, Stats,
+                        StreamingTable, TabularData, TelemetryBuffer,
+                        ViewRefreshes, add_months, aggregate_hourly,
+                        expired_partitions, export_tables, stream_table)
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_telemetry_buffer_flush():
+    copied = []
+
+    async def copy_records_to_table(table, *, records, columns):
+        copied.append((table, list(records), columns))
+
+    buffer = TelemetryBuffer("commands", ("a", "b"), flush_size=3, max_size=5)
+    assert buffer.add((1, 2)) is False
+    assert buffer.add((3, 4)) is False
+    assert buffer.add((5, 6)) is True
+
+    total = await buffer.flush(SimpleNamespace(copy_records_to_table=copy_records_to_table))  # type: ignore
+    assert total == 3
+    assert copied == [("commands", [(1, 2), (3, 4), (5, 6)], ("a", "b"))]
+    assert len(buffer) == 0
+
+
+async def test_telemetry_buffer_bounded():
+    async def copy_records_to_table(table, *, records, columns):
+        raise OSError("database is down")
+
+    pool = SimpleNamespace(copy_records_to_table=copy_records_to_table)
+    buffer = TelemetryBuffer("commands", ("a",), flush_size=2, max_size=3)
+    for x in range(5):
+        buffer.add((x,))
+    assert len(buffer) == 3
+    assert buffer.dropped == 2
+
+    with pytest.raises(OSError):
+        await buffer.flush(pool)  # type: ignore
+    assert buffer.rows == [(0,), (1,), (2,)]
+    assert buffer.dropped == 2
+
+
+async def test_aggregate_hourly():
+    hour = datetime.datetime(2024, 1, 1, 12)
+    rows = [
+        (1, 10, 100, hour.replace(minute=5), "!", "tasks", False),
+        (1, 10, 100, hour.replace(minute=55), "!", "tasks", True),
+        (None, 20, 200, hour.replace(hour=13, minute=1), "!", "tasks", False),
+    ]
+    commands, guilds, authors = aggregate_hourly(rows)
+    assert commands == {(hour, "tasks", False): 1, (hour, "tasks", True): 1, (hour.replace(hour=13), "tasks", False): 1}
+    assert guilds == {(hour, 1): 2, (hour.replace(hour=13), 0): 1}
+    assert authors == {(hour, 100): 2, (hour.replace(hour=13), 200): 1}
+
+
+async def test_telemetry_buffer_rollup_in_transaction():
+    calls = []
+
+    @asynccontextmanager
+    async def transaction():
+        calls.append("begin")
+        yield
+        calls.append("commit")
+
+    async def copy_records_to_table(table, *, records, columns):
+        calls.append("copy")
+
+    async def rollup(con, batch):
+        calls.append(("rollup", len(batch)))
+
+    con = SimpleNamespace(transaction=transaction, copy_records_to_table=copy_records_to_table)
+
+    @asynccontextmanager
+    async def acquire():
+        yield con
+
+    buffer = TelemetryBuffer("commands", ("a",), rollup=rollup)
+    buffer.add((1,))
+    buffer.add((2,))
+    assert await buffer.flush(SimpleNamespace(acquire=acquire)) == 2  # type: ignore
+    assert calls == ["begin", "copy", ("rollup", 2), "commit"]
+
+
+async def test_add_months():
+    dt = datetime.datetime(2024, 11, 15, 13, 30)
+    assert add_months(dt, 0) == datetime.datetime(2024, 11, 1)
+    assert add_months(dt, 2) == datetime.datetime(2025, 1, 1)
+    assert add_months(dt, -11) == datetime.datetime(2023, 12, 1)
+
+
+async def test_expired_partitions():
+    names = ["commands_2024_03", "commands_default", "commands_2023_12", "commands_2024_01", "commands_2024_02"]
+    now = datetime.datetime(2024, 3, 20)
+    assert expired_partitions(names, now, 2) == ["commands_2023_12"]
+    assert expired_partitions(names, now, 1) == ["commands_2023_12", "commands_2024_01"]
+
+
+async def test_commands_partitioned():
+    assert "PARTITION BY RANGE (used);" in Commands.create_table()
+
+
+async def test_views_created_with_tables():
+    statement = ViewRefreshes.create_table()
+    for name, (query, _) in MATERIALIZED_VIEWS.items():
+        assert f"CREATE MATERIALIZED VIEW IF NOT EXISTS {name}" in statement
+        # a per-row timestamp would make every concurrent refresh rewrite every row
+        assert "now()" not in query
+
+
+def _record(msg: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord("discord.gateway", level, __file__, 0, msg, None, None)
+
+
+async def test_gateway_digest_dedupes():
+    digest = GatewayDigest(max_size=2)
+    for _ in range(3):
+        digest.add(_record("Shard ID 0 has connected"))
+    digest.add(_record("Shard ID 1 has connected"))
+    digest.add(_record("Shard ID 2 has connected"))
+    assert len(digest) == 2
+    assert digest.dropped == 1
+
+    (message,) = digest.drain()
+    assert "`Shard ID 0 has connected` (x3)" in message
+    assert "Shard ID 2" not in message
+    assert "1 gateway records dropped" in message
+    assert len(digest) == 0 and digest.drain() == []
+
+
+async def test_gateway_digest_splits_messages():
+    digest = GatewayDigest(message_size=200)
+    for x in range(20):
+        digest.add(_record(f"Shard ID {x} session has been invalidated"))
+    messages = digest.drain()
+    assert len(messages) > 1
+    assert all(len(m) <= 200 for m in messages)
+    assert sum(m.count("invalidated") for m in messages) == 20
+
+
+async def test_streaming_table_matches_tabular_data():
+    rows = [("tasks", 1), ("reminder create", 20)]
+    table = TabularData()
+    table.set_columns(["command", "uses"])
+    table.add_rows(rows)
+
+    streaming = StreamingTable(["command", "uses"], rows)
+    rendered = "\n".join([streaming.header(), *(streaming.render_row(r) for r in rows), streaming.separator])
+    assert rendered == table.render()
+
+
+async def test_stream_table_caps_widths_and_size():
+    async def rows():
+        for x in range(5000):
+            yield (f"command {x}", "x" * 100)
+
+    fp = io.BytesIO()
+    total, truncated = await stream_table(fp, ["command", "args"], [("command", "x" * 100)], rows(), max_bytes=100_000)
+    lines = fp.getvalue().decode("utf-8").splitlines()
+    assert truncated
+    assert total < 5001
+    assert len(lines) == total + 4
+    assert len({len(line) for line in lines}) == 1
+    assert all(len(line) <= 2 * 42 + 3 for line in lines)
+
+    fp = io.BytesIO()
+    total, truncated = await stream_table(fp, ["command", "args"], [], rows(), max_bytes=10_000_000)
+    assert total == 5000 and not truncated
+
+
+async def test_component_interactions_are_only_counted():
+    async def register_command(ctx):
+        raise AssertionError("components are not commands")
+
+    cog = SimpleNamespace(interaction_stats=Counter(), register_command=register_command)
+    for kind in (discord.InteractionType.component, discord.InteractionType.autocomplete, discord.InteractionType.component):
+        await Stats.on_interaction(cog, SimpleNamespace(type=kind))  # type: ignore
+    assert cog.interaction_stats == {"component": 2, "autocomplete": 1}
+
+
+async def test_export_tables(tmp_path):
+    calls = []
+
+    async def copy_from_query(query, *args, output, **options):
+        calls.append((query, args, options))
+        output.write(b'{"id": 1}\n')
+
+    con = SimpleNamespace(copy_from_query=copy_from_query)
+    start, end = datetime.datetime(2024, 1, 1), datetime.datetime(2024, 2, 1)
+    paths = await export_tables(con, str(tmp_path), start, end, fmt="ndjson")  # type: ignore
+
+    assert [p.rsplit("/", 1)[-1] for p in paths] == ["commands_20240101_20240201.ndjson.gz", "joined_20240101_20240201.ndjson.gz"]
+    with gzip.open(paths[0]) as fp:
+        assert fp.read() == b'{"id": 1}\n'
+    assert all(query.startswith("SELECT row_to_json(t)") and args == (start, end) for query, args, _ in calls)
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+async def test_shard_metrics_pruned_on_elapsed_time(monkeypatch):
+    statements = []
+
+    async def execute(query, *args):
+        statements.append(query.split()[0])
+
+    @asynccontextmanager
+    async def acquire():
+        yield SimpleNamespace(execute=execute)
+
+    bot = SimpleNamespace(shards={0: SimpleNamespace(latency=0.1)}, guilds=[], pool=SimpleNamespace(acquire=acquire))
+    cog = SimpleNamespace(bot=bot, _metrics_pruned_at=None)
+    start = datetime.datetime(2024, 3, 20, 12, 30, tzinfo=datetime.timezone.utc)
+    # the loop never lands on minute 0 here
+    for minutes in (0, 59, 91):
+        monkeypatch.setattr(discord.utils, "utcnow", lambda: start + datetime.timedelta(minutes=minutes))
+        await Stats.record_shard_metrics(cog)  # type: ignore
+    assert statements == ["INSERT", "DELETE", "INSERT", "INSERT", "DELETE"]
+
+
+async def test_tabulate_query_attaches_table_that_only_fits_without_note():
+    rows = [{"command": "x" * 40, "uses": n} for n in range(30)]
+
+    class Cursor:
+        def __aiter__(self):
+            async def iterate():
+                for row in rows:
+                    yield row
+            return iterate()
+
+    @asynccontextmanager
+    async def transaction():
+        yield
+
+    @asynccontextmanager
+    async def acquire():
+        yield SimpleNamespace(transaction=transaction, cursor=lambda query, *args, prefetch: Cursor())
+
+    sent = []
+
+    async def send(content, *, file=None):
+        sent.append((content, file and file.fp.read()))
+
+    cog = SimpleNamespace(bot=SimpleNamespace(pool=SimpleNamespace(acquire=acquire)))
+    await Stats.tabulate_query(cog, SimpleNamespace(send=send), "SELECT")  # type: ignore
+    ((table, attached),) = sent
+    assert len(table) <= 2000 and attached is None
+
+    sent.clear()
+    await Stats.tabulate_query(cog, SimpleNamespace(send=send), "SELECT", note="n" * (2000 - len(table)))  # type: ignore
+    ((content, attached),) = sent
+    assert "Too many results" in content
+    assert attached.decode("utf-8") == table
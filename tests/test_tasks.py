@@ -1,14 +1,48 @@
 from __future__ import annotations
 
+import asyncio
 import datetime
+import io
+import os
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
 
+import asyncpg
 import discord
 import pytest
-from cogs.tasks import Task
+import pytest_asyncio
+from cogs.reminder import Reminders
+from cogs.tasks import (AgendaPageSource, ReminderScheduler, Task, TaskCompletions, TaskHistory, TaskStats, TaskStreaks, TasksTracked, TaskTracker,
+                        format_interval, iter_json_objects)
+from utils.time import Interval
 
 pytestmark = pytest.mark.asyncio
 
 
+@pytest_asyncio.fixture
+async def con():
+    """A connection to the database in ``TEST_POSTGRESQL`` with the task tables
+    created inside a transaction that is rolled back afterwards."""
+    dsn = os.environ.get("TEST_POSTGRESQL")
+    if not dsn:
+        pytest.skip("TEST_POSTGRESQL is not set")
+    connection = await asyncpg.connect(dsn)
+    transaction = connection.transaction()
+    await transaction.start()
+    try:
+        for table in (TasksTracked, TaskHistory, TaskStreaks, TaskCompletions, Reminders):
+            await connection.execute(table.create_table())
+        yield connection
+    finally:
+        await transaction.rollback()
+        await connection.close()
+
+
+async def _insert_task(con: asyncpg.Connection, last_reset: datetime.datetime, *, user_id: int = 1, completed: bool = False) -> int:
+    query = "INSERT INTO taskstracked (user_id, name, interval, last_reset, completed) VALUES ($1, 'test', '1 day', $2, $3) RETURNING id;"
+    return await con.fetchval(query, user_id, last_reset, completed)
+
+
 def boundedIncrement(num: int, _max: int):
     num = num + 1
     if num > _max:
@@ -147,3 +181,185 @@ async def test_task_from_future():
     target = date
     next_reset = task.next_reset()
     assert next_reset == target
+
+
+async def test_task_stats_completion_rate():
+    record = {
+        "task_id": 1,
+        "user_id": 215227961048170496,
+        "current_streak": 2,
+        "best_streak": 5,
+        "total_completed": 6,
+        "total_missed": 2,
+    }
+    stats = TaskStats(record=record)
+    assert stats.total == 8
+    assert stats.completion_rate == 0.75
+
+
+async def test_task_stats_empty():
+    now = discord.utils.utcnow().replace(tzinfo=None)
+    record = {
+        "id": 1,
+        "user_id": 215227961048170496,
+        "created": now,
+        "name": "test daily task",
+        "time": now.time(),
+        "interval": datetime.timedelta(days=1),
+        "last_reset": now,
+        "reset_datetime": now,
+        "remind_me": True,
+        "completed": False,
+    }
+    stats = TaskStats.empty(Task(record=record))
+    assert stats.task_id == 1
+    assert stats.total == 0
+    assert stats.completion_rate == 0.0
+
+
+async def test_iter_json_objects():
+    array = '[{"name": "read"}, {"name": "walk", "tags": [1, 2]}]'
+    assert list(iter_json_objects(io.StringIO(array), chunk_size=4)) == [{"name": "read"}, {"name": "walk", "tags": [1, 2]}]
+
+    lines = '{"name": "read"}\n{"name": "]walk["}\n'
+    assert list(iter_json_objects(io.StringIO(lines), chunk_size=4)) == [{"name": "read"}, {"name": "]walk["}]
+
+
+async def test_format_interval_round_trip():
+    for delta in (datetime.timedelta(minutes=30), datetime.timedelta(days=1), datetime.timedelta(days=9, hours=3, minutes=15)):
+        assert Interval(format_interval(delta)).interval == delta
+
+
+async def test_reminder_scheduler_sends_everything():
+    sent = []
+    global_over = asyncio.Event()
+    global_over.set()
+
+    async def send_reminder(task):
+        sent.append(task)
+
+    cog = SimpleNamespace(bot=SimpleNamespace(http=SimpleNamespace(_global_over=global_over)), send_reminder=send_reminder)
+    scheduler = ReminderScheduler(cog, jitter=0.05, rate=1000)  # type: ignore
+    scheduler.start()
+    for x in range(20):
+        scheduler.schedule(x)  # type: ignore
+    assert scheduler.queued > 0
+
+    for _ in range(100):
+        if len(sent) == 20:
+            break
+        await asyncio.sleep(0.01)
+    scheduler.stop()
+
+    assert sorted(sent) == list(range(20))
+    assert scheduler.sent == 20
+    assert scheduler.queued == 0
+    assert len(scheduler.send_latencies) == 20
+
+
+async def test_agenda_keyset_pages():
+    now = discord.utils.utcnow().replace(tzinfo=None)
+    rows = sorted(
+        [{"kind": "task", "id": x, "due": now + datetime.timedelta(hours=x), "title": f"task {x}"} for x in range(7)]
+        + [{"kind": "reminder", "id": x, "due": now + datetime.timedelta(hours=x), "title": f"reminder {x}"} for x in range(6)],
+        key=lambda r: (r["due"], r["kind"], r["id"]),
+    )
+    queries = []
+
+    async def fetch(query, user_id, due, kind, _id, limit):
+        queries.append((due, kind, _id))
+        return [r for r in rows if (r["due"], r["kind"], r["id"]) > (due, kind, _id)][:limit]
+
+    source = AgendaPageSource(SimpleNamespace(fetch=fetch), 1, per_page=5)  # type: ignore
+    await source._prepare_once()
+    assert source.get_max_pages() is None
+
+    pages = [await source.get_page(x) for x in range(3)]
+    assert [r for page in pages for r in page] == rows
+    assert source.get_max_pages() == 3
+    assert len(queries) == 3
+
+    # pages are only fetched once
+    await source.get_page(0)
+    assert len(queries) == 3
+
+
+async def test_agenda_empty():
+    async def fetch(*args):
+        return []
+
+    source = AgendaPageSource(SimpleNamespace(fetch=fetch), 1)  # type: ignore
+    await source._prepare_once()
+    assert source.empty
+
+
+async def test_record_reset(con):
+    task_id = await _insert_task(con, datetime.datetime(2024, 3, 20))
+    for completed in (True, True, False, True):
+        await TaskTracker.record_reset(None, task_id, 1, completed, datetime.datetime(2024, 3, 20), connection=con)  # type: ignore
+
+    record = await con.fetchrow("SELECT * FROM taskstreaks WHERE task_id = $1", task_id)
+    assert (record["current_streak"], record["best_streak"]) == (1, 2)
+    assert (record["total_completed"], record["total_missed"]) == (3, 1)
+    assert await con.fetchval("SELECT COUNT(*) FROM taskhistory WHERE task_id = $1", task_id) == 4
+
+
+async def test_reconcile_timers(con):
+    @asynccontextmanager
+    async def acquire(timeout=None):
+        yield con
+
+    invalidated = []
+    bot = SimpleNamespace(pool=SimpleNamespace(acquire=acquire), reminder=None)
+    cog = SimpleNamespace(bot=bot, get_tasks=SimpleNamespace(invalidate=lambda _, user_id: invalidated.append(user_id)))
+
+    now = discord.utils.utcnow().replace(tzinfo=None)
+    overdue = await _insert_task(con, now - datetime.timedelta(days=2, hours=1), user_id=1, completed=True)
+    upcoming = await _insert_task(con, now + datetime.timedelta(hours=2), user_id=2)
+    scheduled = await _insert_task(con, now + datetime.timedelta(hours=3), user_id=3)
+    await con.execute(
+        "INSERT INTO reminders (event, extra, expires) VALUES ('task_reset', jsonb_build_object('args', jsonb_build_array(3, $1::bigint)), $2);",
+        scheduled, now + datetime.timedelta(hours=3),
+    )
+
+    await TaskTracker.reconcile_timers(cog)  # type: ignore
+    assert invalidated == [1]
+
+    record = await con.fetchrow("SELECT completed, reset_datetime FROM taskstracked WHERE id = $1", overdue)
+    assert record["completed"] is False
+    assert record["reset_datetime"] > now
+    assert await con.fetchval("SELECT total_completed FROM taskstreaks WHERE task_id = $1", overdue) == 1
+
+    query = "SELECT (extra #>> '{args,1}')::bigint, COUNT(*) FROM reminders WHERE event = 'task_reset' GROUP BY 1;"
+    assert dict(await con.fetch(query)) == {overdue: 1, upcoming: 1, scheduled: 1}
+
+    # a second pass finds nothing missing
+    await TaskTracker.reconcile_timers(cog)  # type: ignore
+    assert dict(await con.fetch(query)) == {overdue: 1, upcoming: 1, scheduled: 1}
+
+
+async def test_set_completed_uncounts_from_where_it_was_counted(con):
+    cog = SimpleNamespace(bot=SimpleNamespace(pool=con), get_tasks=SimpleNamespace(invalidate=lambda *_: None))
+    now = discord.utils.utcnow().replace(tzinfo=None)
+    first, second, from_dm = [await _insert_task(con, now) for _ in range(3)]
+
+    async def completions() -> dict:
+        return {(r["guild_id"], r["week"] < this_week): r["completions"] for r in await con.fetch("SELECT * FROM taskcompletions")}
+
+    this_week = await con.fetchval("SELECT date_trunc('week', now() at time zone 'utc')::date")
+    await TaskTracker.set_completed(cog, 1, [first, second], [first, second], guild_id=10)  # type: ignore
+    await TaskTracker.set_completed(cog, 1, [from_dm], [from_dm])  # type: ignore
+    assert await completions() == {(10, False): 2}
+
+    # the first completion was counted last week
+    await con.execute("UPDATE taskstracked SET completed_week = completed_week - 7 WHERE id = $1", first)
+    await con.execute("UPDATE taskcompletions SET completions = 1")
+    await con.execute("INSERT INTO taskcompletions (guild_id, user_id, week, completions) VALUES (10, 1, $1::date - 7, 1)", this_week)
+
+    # unchecked in another guild, the points come off where they were counted
+    await TaskTracker.set_completed(cog, 1, [first, second, from_dm], [], guild_id=20)  # type: ignore
+    assert await completions() == {(10, False): 0, (10, True): 0}
+
+    # checking again in the other guild counts there
+    await TaskTracker.set_completed(cog, 1, [first, second], [first], guild_id=20)  # type: ignore
+    assert await completions() == {(10, False): 0, (10, True): 0, (20, False): 1}
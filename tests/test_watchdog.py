@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+from utils.watchdog import LoopWatchdog
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_watchdog_captures_blocking_stack():
+    watchdog = LoopWatchdog(interval=0.02, threshold=0.05, capacity=2)
+    watchdog.start()
+    await asyncio.sleep(0.05)
+
+    def blocking_call():
+        time.sleep(0.3)
+
+    blocking_call()
+    await asyncio.sleep(0.05)
+    watchdog.stop()
+
+    assert len(watchdog.stalls) == 1
+    (stall,) = watchdog.stalls
+    assert any("blocking_call" in line for line in stall.stack)
+    assert stall.lag >= 0.2
+    assert watchdog.max_lag >= 0.2
+    assert watchdog.percentile(0.5) < 0.2
@@ -13,8 +13,9 @@ import enum
 import inspect
 import time
 from functools import wraps
-from typing import (Any, Awaitable, Callable, Coroutine, MutableMapping,
-                    Protocol, TypeVar)
+from collections import OrderedDict
+from typing import (Any, Awaitable, Callable, Coroutine, Dict, Iterator,
+                    MutableMapping, Optional, Protocol, TypeVar)
 
 from lru import LRU
 
@@ -51,6 +52,14 @@ def _wrap_and_store_coroutine(cache: MutableMapping[str, R], key: str, coro: Awa
     return func()
 
 
+def _wait_for_shared(future: asyncio.Future[R]) -> Coroutine[Any, Any, R]:
+    async def func():
+        # a caller being cancelled must not cancel the lookup the other callers are waiting on
+        return await asyncio.shield(future)
+
+    return func()
+
+
 def _wrap_new_coroutine(value: R) -> Coroutine[Any, Any, R]:
     async def new_coroutine():
         return value
@@ -58,28 +67,52 @@ def _wrap_new_coroutine(value: R) -> Coroutine[Any, Any, R]:
     return new_coroutine()
 
 
-class ExpiringCache(dict):
-    def __init__(self, seconds: float):
-        self.__ttl: float = seconds
-        super().__init__()
+class ExpiringCache(MutableMapping[str, Any]):
+    """A mapping whose entries expire ``seconds`` after they were last set.
+
+    Entries are kept in the order they expire in, so expired ones are popped
+    off the front lazily on access instead of scanning the whole cache, and
+    the soonest to expire is evicted once more than ``maxsize`` are stored."""
+
+    def __init__(self, seconds: float, maxsize: Optional[int] = None):
+        self.ttl: float = seconds
+        self.maxsize: Optional[int] = maxsize
+        self._data: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+
+    def __repr__(self) -> str:
+        return f"<ExpiringCache ttl={self.ttl} maxsize={self.maxsize} size={len(self._data)}>"
 
-    def __verify_cache_integrity(self):
-        # Have to do this in two steps...
-        current_time = time.monotonic()
-        to_remove = [k for (k, (v, t)) in self.items() if current_time > (t + self.__ttl)]
-        for k in to_remove:
-            del self[k]
+    def _expire(self) -> None:
+        data = self._data
+        now = time.monotonic()
+        while data:
+            _, expires = data[next(iter(data))]
+            if expires > now:
+                break
+            data.popitem(last=False)
 
-    def __contains__(self, key: str):
-        self.__verify_cache_integrity()
-        return super().__contains__(key)
+    def __getitem__(self, key: str) -> Any:
+        self._expire()
+        return self._data[key][0]
 
-    def __getitem__(self, key: str):
-        self.__verify_cache_integrity()
-        return super().__getitem__(key)
+    def __setitem__(self, key: str, value: Any) -> None:
+        data = self._data
+        data.pop(key, None)
+        data[key] = (value, time.monotonic() + self.ttl)
+        if self.maxsize is not None:
+            while len(data) > self.maxsize:
+                data.popitem(last=False)
 
-    def __setitem__(self, key: str, value: Any):
-        super().__setitem__(key, (value, time.monotonic()))
+    def __delitem__(self, key: str) -> None:
+        del self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        self._expire()
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        self._expire()
+        return len(self._data)
 
 
 class Strategy(enum.Enum):
@@ -92,7 +125,11 @@ def cache(
     maxsize: int = 128,
     strategy: Strategy = Strategy.lru,
     ignore_kwargs: bool = False,
+    ttl: Optional[float] = None,
 ) -> Callable[[Callable[..., R]], CacheProtocol[R]]:
+    if strategy is Strategy.timed and ttl is None:
+        raise ValueError("Strategy.timed requires a ttl")
+
     def decorator(func: Callable[..., R]) -> CacheProtocol[R]:
         if strategy is Strategy.lru:
             _internal_cache = LRU(maxsize)
@@ -105,7 +142,7 @@ def cache(
             def _stats():
                 return (0, 0)
         elif strategy is Strategy.timed:
-            _internal_cache = ExpiringCache(maxsize)
+            _internal_cache = ExpiringCache(ttl, maxsize)  # type: ignore
 
             def _stats():
                 return (0, 0)
@@ -134,16 +171,43 @@ def cache(
 
             return ':'.join(key)
 
+        # cache key -> the running lookup that concurrent misses for that key wait on
+        _inflight: Dict[str, asyncio.Future[Any]] = {}
+
+        def _store_result(key: str, future: asyncio.Future[Any]) -> None:
+            # the key may have been invalidated while the lookup was running
+            if _inflight.get(key) is not future:
+                return
+            del _inflight[key]
+            if not future.cancelled() and future.exception() is None:
+                _internal_cache[key] = future.result()
+
         @wraps(func)
         def wrapper(*args: Any, **kwargs: Any):
             key = _make_key(args, kwargs)
             try:
                 value = _internal_cache[key]
             except KeyError:
+                # The key ignores the connection, so a shared lookup would run on the first
+                # caller's connection. Callers passing their own, e.g. inside a transaction,
+                # run their lookup on it and don't join or start a shared one.
+                if kwargs.get('connection') is not None:
+                    value = func(*args, **kwargs)
+                    if inspect.isawaitable(value):
+                        return _wrap_and_store_coroutine(_internal_cache, key, value)
+                    _internal_cache[key] = value
+                    return value
+
+                pending = _inflight.get(key)
+                if pending is not None:
+                    return _wait_for_shared(pending)
+
                 value = func(*args, **kwargs)
 
                 if inspect.isawaitable(value):
-                    return _wrap_and_store_coroutine(_internal_cache, key, value)
+                    future = _inflight[key] = asyncio.ensure_future(value)
+                    future.add_done_callback(lambda f: _store_result(key, f))
+                    return _wait_for_shared(future)
 
                 _internal_cache[key] = value
                 return value
@@ -153,14 +217,19 @@ def cache(
                 return value
 
         def _invalidate(*args: Any, **kwargs: Any) -> bool:
+            key = _make_key(args, kwargs)
+            _inflight.pop(key, None)
             try:
-                del _internal_cache[_make_key(args, kwargs)]
+                del _internal_cache[key]
             except KeyError:
                 return False
             else:
                 return True
 
         def _invalidate_containing(key: str) -> None:
+            for k in [k for k in _inflight if key in k]:
+                del _inflight[k]
+
             to_remove = []
             for k in _internal_cache.keys():
                 if key in k:
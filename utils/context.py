@@ -20,6 +20,7 @@ if TYPE_CHECKING:
     from aiohttp import ClientSession
     from index import AutoShardedBot
     from asyncpg import Connection, Pool
+    from utils.db import QueryStats
 
 
 class ConfirmationView(discord.ui.View):
@@ -91,6 +92,7 @@ class Context(commands.Context):
         self.pool: Pool = self.bot.pool
         self._db: Optional[Union[Pool, Connection]] = None
         self.command_message: Optional[discord.Message] = None
+        self.query_stats: Optional[QueryStats] = None
 
     def __repr__(self) -> str:
         return "<Context>"
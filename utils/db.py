@@ -1,6 +1,13 @@
 from __future__ import annotations
 import asyncpg
 import json
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Optional
+
+log = logging.getLogger(__name__)
 
 
 class MaybeAcquire:
@@ -21,6 +28,68 @@ class MaybeAcquire:
             await self.pool.release(self._connection)
 
 
+class QueryStats:
+    """Database cost of a single command invocation."""
+
+    __slots__ = ("name", "queries", "rows", "elapsed", "statements", "warn_after")
+
+    def __init__(self, name: str, *, warn_after: Optional[int] = None):
+        self.name: str = name
+        self.queries: int = 0
+        self.rows: int = 0
+        self.elapsed: float = 0.0
+        self.statements: Counter[str] = Counter()
+        self.warn_after: Optional[int] = warn_after
+
+    def __repr__(self) -> str:
+        return f"<QueryStats name={self.name} queries={self.queries} rows={self.rows} elapsed={self.elapsed:.3f}>"
+
+    def record(self, query: str, rows: int, elapsed: float) -> None:
+        self.queries += 1
+        self.rows += rows
+        self.elapsed += elapsed
+        self.statements[query] += 1
+        if self.warn_after is not None and self.statements[query] == self.warn_after:
+            log.warning(f"Possible N+1 in {self.name}, this statement ran {self.warn_after} times: {' '.join(query.split())}")
+
+
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def _status_rows(status: str) -> int:
+    # e.g. "INSERT 0 5", "UPDATE 3", "SELECT 2"
+    last = status.rsplit(" ", 1)[-1]
+    return int(last) if last.isdigit() else 0
+
+
+class InstrumentedConnection(asyncpg.Connection):
+    """Records every query into the :class:`QueryStats` of the command being invoked, if any."""
+
+    async def _timed(self, query: str, coro: Any, rows: Any) -> Any:
+        stats = current_query_stats.get()
+        if stats is None:
+            return await coro
+        start = time.perf_counter()
+        result = await coro
+        stats.record(query, rows(result), time.perf_counter() - start)
+        return result
+
+    async def fetch(self, query: str, *args: Any, **kwargs: Any) -> list:
+        return await self._timed(query, super().fetch(query, *args, **kwargs), len)
+
+    async def fetchrow(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        return await self._timed(query, super().fetchrow(query, *args, **kwargs), lambda r: int(r is not None))
+
+    async def fetchval(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        return await self._timed(query, super().fetchval(query, *args, **kwargs), lambda _: 1)
+
+    async def execute(self, query: str, *args: Any, **kwargs: Any) -> str:
+        return await self._timed(query, super().execute(query, *args, **kwargs), _status_rows)
+
+    async def executemany(self, command: str, args: Any, **kwargs: Any) -> None:
+        return await self._timed(command, super().executemany(command, args, **kwargs), lambda _: 0)
+
+
 class Column:
     __slots__ = ("value",)
 
@@ -34,19 +103,42 @@ class Column:
         return self.value
 
 
+class Index:
+    __slots__ = ("name", "value", "unique", "where")
+
+    def __init__(self, name: str, value: str, *, unique: bool = False, where: Optional[str] = None):
+        self.name = name
+        self.value = value
+        self.unique = unique
+        self.where = where
+
+    def __repr__(self) -> str:
+        return f"<Index {self.name} ({self.value})>"
+
+    def create_index(self, table_name: str) -> str:
+        unique = "UNIQUE " if self.unique else ""
+        where = f" WHERE {self.where}" if self.where else ""
+        return f"CREATE {unique}INDEX IF NOT EXISTS {self.name} ON {table_name} ({self.value}){where};"
+
+
 class TableMeta(type):
     def __new__(cls, name, parents, dct, **kwargs):
         columns = []
+        indexes = []
         try:
             table_name = kwargs["table_name"]
         except KeyError:
             table_name = name.lower()
 
         dct["__tablename__"] = table_name
+        dct["__partition_by__"] = kwargs.get("partition_by")
         for elem, value in dct.items():
             if isinstance(value, Column):
                 columns.append(value)
+            elif isinstance(value, Index):
+                indexes.append(value)
         dct["columns"] = columns
+        dct["indexes"] = indexes
         return super().__new__(cls, name, parents, dct)
 
     def __init__(self, name, parents, dct, **kwargs):
@@ -56,7 +148,9 @@ class TableMeta(type):
 class Table(metaclass=TableMeta):  # type: ignore
     _pool: asyncpg.Pool
     __tablename__: str
+    __partition_by__: Optional[str]
     columns: list[Column]
+    indexes: list[Index]
 
     @classmethod
     async def create_pool(cls, uri, **kwargs) -> asyncpg.Pool:
@@ -72,6 +166,7 @@ class Table(metaclass=TableMeta):  # type: ignore
             'command_timeout': 60,
             'max_size': 15,
             'min_size': 15,
+            'connection_class': InstrumentedConnection,
         })
 
         async def init(con):
@@ -97,8 +192,13 @@ class Table(metaclass=TableMeta):  # type: ignore
         for col in cls.columns:
             column_creations.append(col.value)
         builder.append('(%s)' % ', '.join(column_creations))
+        if cls.__partition_by__:
+            builder.append(f"PARTITION BY {cls.__partition_by__}")
         statements.append(' '.join(builder) + ";")
 
+        for index in cls.indexes:
+            statements.append(index.create_index(cls.__tablename__))
+
         return '\n'.join(statements)
 
     @classmethod
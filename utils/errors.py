@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import datetime
+import hashlib
+import time
+import traceback
+from collections import OrderedDict
+from typing import List, Optional
+
+import discord
+
+
+def fingerprint(error: BaseException, *, frames: int = 3) -> str:
+    """Identifies an error by its type and the innermost ``frames`` frames of its traceback.
+
+    Line numbers are left out so a fingerprint survives unrelated edits to the file."""
+    parts = [f"{type(error).__module__}.{type(error).__qualname__}"]
+    for frame in traceback.extract_tb(error.__traceback__)[-frames:]:
+        parts.append(f"{frame.filename}:{frame.name}")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:12]
+
+
+class ErrorReport:
+    __slots__ = ("fingerprint", "name", "message", "where", "traceback", "count", "first_seen", "last_seen", "suppressed", "_last_logged")
+
+    def __init__(self, fingerprint: str, error: BaseException, where: str):
+        now = discord.utils.utcnow()
+        self.fingerprint: str = fingerprint
+        self.name: str = type(error).__qualname__
+        self.message: str = str(error)
+        self.where: str = where
+        self.traceback: str = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+        self.count: int = 0
+        self.first_seen: datetime.datetime = now
+        self.last_seen: datetime.datetime = now
+        self.suppressed: int = 0
+        self._last_logged: Optional[float] = None
+
+    def __repr__(self) -> str:
+        return f"<ErrorReport fingerprint={self.fingerprint} name={self.name} count={self.count}>"
+
+
+class ErrorAggregator:
+    """Counts errors by fingerprint and decides when one is worth logging in full again.
+
+    Each fingerprint is logged once per ``window`` seconds, and only the
+    ``max_size`` most recently seen fingerprints are kept."""
+
+    def __init__(self, *, window: float = 300.0, max_size: int = 500):
+        self.window: float = window
+        self.max_size: int = max_size
+        self.reports: OrderedDict[str, ErrorReport] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.reports)
+
+    def record(self, error: BaseException, where: str) -> Optional[int]:
+        """Records an error, returns the number of times it was suppressed since
+        it was last logged if it should be logged now, otherwise ``None``."""
+        key = fingerprint(error)
+        report = self.reports.get(key)
+        if report is None:
+            report = self.reports[key] = ErrorReport(key, error, where)
+            if len(self.reports) > self.max_size:
+                self.reports.popitem(last=False)
+        else:
+            self.reports.move_to_end(key)
+            report.last_seen = discord.utils.utcnow()
+        report.count += 1
+
+        now = time.monotonic()
+        if report._last_logged is not None and now - report._last_logged < self.window:
+            report.suppressed += 1
+            return None
+        report._last_logged = now
+        suppressed, report.suppressed = report.suppressed, 0
+        return suppressed
+
+    def get(self, fingerprint: str) -> Optional[ErrorReport]:
+        return self.reports.get(fingerprint)
+
+    def most_common(self, n: Optional[int] = None) -> List[ErrorReport]:
+        return sorted(self.reports.values(), key=lambda r: r.count, reverse=True)[:n]
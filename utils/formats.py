@@ -9,7 +9,7 @@ file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 from __future__ import annotations
 
-from typing import Sequence
+from typing import Optional, Sequence
 
 
 class plural:
@@ -37,3 +37,17 @@ def human_join(seq: Sequence[str], delim: str = ', ', final: str = 'or') -> str:
         return f'{seq[0]} {final} {seq[1]}'
 
     return delim.join(seq[:-1]) + f' {final} {seq[-1]}'
+
+
+SPARK_CHARS = '▁▂▃▄▅▆▇█'
+
+
+def sparkline(values: Sequence[Optional[float]]) -> str:
+    """Renders values as a line of block characters, gaps are left blank."""
+    present = [v for v in values if v is not None]
+    if not present:
+        return ' ' * len(values)
+    low, high = min(present), max(present)
+    spread = (high - low) or 1
+    top = len(SPARK_CHARS) - 1
+    return ''.join(' ' if v is None else SPARK_CHARS[int((v - low) / spread * top)] for v in values)
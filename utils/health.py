@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+from typing import Dict, List, Optional, Set
+
+import discord
+
+
+class TaskHealth:
+    """Bookkeeping for one named long-running task."""
+
+    __slots__ = ("name", "task", "started_at", "last_tick", "ticks", "restarts", "failures", "last_exception")
+
+    def __init__(self, name: str):
+        self.name: str = name
+        self.task: Optional[asyncio.Task] = None
+        self.started_at: Optional[datetime.datetime] = None
+        self.last_tick: Optional[datetime.datetime] = None
+        self.ticks: int = 0
+        self.restarts: int = 0
+        self.failures: int = 0
+        self.last_exception: Optional[BaseException] = None
+
+    def __repr__(self) -> str:
+        return f"<TaskHealth name={self.name} running={self.running} ticks={self.ticks} failures={self.failures}>"
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def tick(self) -> None:
+        self.last_tick = discord.utils.utcnow()
+        self.ticks += 1
+
+    def fail(self, exc: BaseException) -> None:
+        self.failures += 1
+        self.last_exception = exc
+
+
+class TaskRegistry:
+    """Tracks the bot's background tasks and in-flight event handlers by name,
+    so health checks don't have to scan ``asyncio.all_tasks``."""
+
+    def __init__(self):
+        self.entries: Dict[str, TaskHealth] = {}
+        self.events: Set[asyncio.Task] = set()
+
+    def __repr__(self) -> str:
+        return f"<TaskRegistry tasks={len(self.entries)} events={len(self.events)}>"
+
+    def register(self, name: str, task: asyncio.Task) -> TaskHealth:
+        """Starts tracking ``task`` under ``name``, replacing a previous task with the same name."""
+        entry = self.entries.get(name)
+        if entry is None:
+            entry = self.entries[name] = TaskHealth(name)
+        elif entry.task is not task:
+            entry.restarts += 1
+        entry.task = task
+        entry.started_at = discord.utils.utcnow()
+        task.add_done_callback(lambda t: self._on_done(entry, t))
+        return entry
+
+    def get(self, name: str) -> Optional[TaskHealth]:
+        return self.entries.get(name)
+
+    def tick(self, name: str) -> None:
+        entry = self.entries.get(name)
+        if entry is not None:
+            entry.tick()
+
+    def fail(self, name: str, exc: BaseException) -> None:
+        entry = self.entries.get(name)
+        if entry is not None:
+            entry.fail(exc)
+
+    def track_event(self, task: asyncio.Task) -> None:
+        self.events.add(task)
+        task.add_done_callback(self.events.discard)
+
+    def snapshot(self) -> List[TaskHealth]:
+        return sorted(self.entries.values(), key=lambda e: e.name)
+
+    @staticmethod
+    def _on_done(entry: TaskHealth, task: asyncio.Task) -> None:
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            entry.fail(exc)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import math
+import time
+from typing import List, Optional
+
+
+class RollingCounter:
+    """Fixed-size ring of time buckets, each holding a sum and a sample count.
+
+    Buckets are ``resolution`` seconds wide and are reused in place once they
+    fall out of the window, so memory never grows past ``slots`` buckets."""
+
+    __slots__ = ("resolution", "sums", "counts", "stamps")
+
+    def __init__(self, slots: int, *, resolution: float = 60.0):
+        self.resolution: float = resolution
+        self.sums: List[float] = [0.0] * slots
+        self.counts: List[int] = [0] * slots
+        self.stamps: List[int] = [-1] * slots
+
+    def __repr__(self) -> str:
+        return f"<RollingCounter slots={len(self.sums)} resolution={self.resolution}>"
+
+    def _bucket(self, now: Optional[float]) -> int:
+        return int((time.time() if now is None else now) // self.resolution)
+
+    def add(self, value: float = 1.0, *, now: Optional[float] = None) -> None:
+        bucket = self._bucket(now)
+        slot = bucket % len(self.sums)
+        if self.stamps[slot] != bucket:
+            self.stamps[slot] = bucket
+            self.sums[slot] = 0.0
+            self.counts[slot] = 0
+        self.sums[slot] += value
+        self.counts[slot] += 1
+
+    def _slots(self, buckets: int, now: Optional[float]) -> List[Optional[int]]:
+        """The slots of the last ``buckets`` buckets, oldest first, ``None`` where nothing was recorded."""
+        current = self._bucket(now)
+        size = len(self.sums)
+        slots: List[Optional[int]] = []
+        for bucket in range(current - min(buckets, size) + 1, current + 1):
+            slot = bucket % size
+            slots.append(slot if self.stamps[slot] == bucket else None)
+        return slots
+
+    def series(self, buckets: int, *, now: Optional[float] = None) -> List[float]:
+        """The sums of the last ``buckets`` buckets, oldest first, including the current one."""
+        return [0.0 if slot is None else self.sums[slot] for slot in self._slots(buckets, now)]
+
+    def total(self, buckets: int, *, now: Optional[float] = None) -> float:
+        return sum(self.series(buckets, now=now))
+
+    def mean(self, buckets: int, *, now: Optional[float] = None) -> Optional[float]:
+        """The mean of the samples recorded in the last ``buckets`` buckets."""
+        slots = [slot for slot in self._slots(buckets, now) if slot is not None]
+        count = sum(self.counts[slot] for slot in slots)
+        if count == 0:
+            return None
+        return sum(self.sums[slot] for slot in slots) / count
+
+
+class ShardStats:
+    """Gateway health for a single shard, in constant memory."""
+
+    __slots__ = ("identifies", "resumes", "latency", "events", "_sequence")
+
+    def __init__(self):
+        # hourly buckets for a week
+        self.identifies = RollingCounter(24 * 7, resolution=3600.0)
+        self.resumes = RollingCounter(24 * 7, resolution=3600.0)
+        # per minute samples for an hour
+        self.latency = RollingCounter(60)
+        # per minute for a day
+        self.events = RollingCounter(60 * 24)
+        self._sequence: Optional[int] = None
+
+    def __repr__(self) -> str:
+        return f"<ShardStats identifies={self.identifies.total(24):.0f} resumes={self.resumes.total(24):.0f}>"
+
+    def add_latency(self, latency: float, *, now: Optional[float] = None) -> None:
+        if math.isfinite(latency):
+            self.latency.add(latency, now=now)
+
+    def add_sequence(self, sequence: Optional[int], *, now: Optional[float] = None) -> None:
+        """Counts the dispatch events received since the last sampled gateway sequence number.
+
+        A lower sequence than last time means a new session started, which counts from zero."""
+        if sequence is None:
+            return
+        last, self._sequence = self._sequence, sequence
+        if last is None:
+            return
+        self.events.add(sequence - last if sequence >= last else sequence, now=now)
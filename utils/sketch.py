@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import datetime
+from collections import Counter, deque
+from typing import Deque, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+
+class SpaceSaving(Generic[K]):
+    """Approximate top-K counter that never tracks more than ``capacity`` keys.
+
+    When a new key arrives while full, the smallest key is evicted and the new
+    key inherits its count, so counts are overestimates by at most ``error``."""
+
+    def __init__(self, capacity: int):
+        self.capacity: int = capacity
+        self.counts: Dict[K, int] = {}
+        self.errors: Dict[K, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def add(self, key: K, count: int = 1) -> None:
+        if key in self.counts:
+            self.counts[key] += count
+            return
+
+        if len(self.counts) < self.capacity:
+            self.counts[key] = count
+            self.errors[key] = 0
+            return
+
+        victim = min(self.counts, key=self.counts.__getitem__)
+        floor = self.counts.pop(victim)
+        del self.errors[victim]
+        self.counts[key] = floor + count
+        self.errors[key] = floor
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[K, int]]:
+        return Counter(self.counts).most_common(n)
+
+
+class WindowedTopK(Generic[K]):
+    """Heavy hitters over a sliding window.
+
+    The window is split into ``buckets`` fixed-size Space-Saving sketches, the
+    oldest is dropped as time moves on, so memory is ``buckets * capacity``."""
+
+    def __init__(self, window: datetime.timedelta, *, buckets: int, capacity: int = 100):
+        self.window: datetime.timedelta = window
+        self.span: datetime.timedelta = window / buckets
+        self.capacity: int = capacity
+        self.buckets: Deque[Tuple[datetime.datetime, SpaceSaving[K]]] = deque(maxlen=buckets)
+
+    def _bucket_start(self, now: datetime.datetime) -> datetime.datetime:
+        epoch = datetime.datetime(1970, 1, 1, tzinfo=now.tzinfo)
+        return now - ((now - epoch) % self.span)
+
+    def _expire(self, now: datetime.datetime) -> None:
+        cutoff = now - self.window
+        while self.buckets and self.buckets[0][0] + self.span <= cutoff:
+            self.buckets.popleft()
+
+    def add(self, key: K, now: datetime.datetime, count: int = 1) -> None:
+        start = self._bucket_start(now)
+        if not self.buckets or self.buckets[-1][0] < start:
+            self.buckets.append((start, SpaceSaving(self.capacity)))
+        self.buckets[-1][1].add(key, count)
+
+    def most_common(self, n: int, now: datetime.datetime) -> List[Tuple[K, int]]:
+        self._expire(now)
+        total: Counter = Counter()
+        for _, sketch in self.buckets:
+            total.update(sketch.counts)
+        return total.most_common(n)
+
+
+class TopKWindows(Generic[K]):
+    """The same key stream tracked over the 1h, 24h and 7d windows."""
+
+    WINDOWS = {
+        "hour": (datetime.timedelta(hours=1), 12),
+        "day": (datetime.timedelta(days=1), 24),
+        "week": (datetime.timedelta(days=7), 28),
+    }
+
+    def __init__(self, *, capacity: int = 100):
+        self.windows: Dict[str, WindowedTopK[K]] = {
+            name: WindowedTopK(window, buckets=buckets, capacity=capacity) for name, (window, buckets) in self.WINDOWS.items()
+        }
+
+    def add(self, key: K, now: datetime.datetime) -> None:
+        for window in self.windows.values():
+            window.add(key, now)
+
+    def most_common(self, window: str, n: int, now: datetime.datetime) -> List[Tuple[K, int]]:
+        return self.windows[window].most_common(n, now)
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, List, Optional
+
+import discord
+
+
+class Stall:
+    """One period where the event loop stopped responding."""
+
+    __slots__ = ("when", "lag", "stack")
+
+    def __init__(self, when: datetime.datetime, lag: float, stack: List[str]):
+        self.when: datetime.datetime = when
+        self.lag: float = lag
+        self.stack: List[str] = stack
+
+    def __repr__(self) -> str:
+        return f"<Stall when={self.when} lag={self.lag:.3f}>"
+
+
+class LoopWatchdog:
+    """Measures event loop lag and captures what the loop thread was doing when it stalls.
+
+    A heartbeat task on the loop records when it last ran. A daemon thread
+    checks the heartbeat and, once it is more than ``threshold`` seconds
+    late, samples the loop thread's stack into a ring buffer of ``capacity``
+    stalls. The sampled stall's lag is updated when the heartbeat resumes."""
+
+    def __init__(self, *, interval: float = 0.25, threshold: float = 0.1, capacity: int = 50):
+        self.interval: float = interval
+        self.threshold: float = threshold
+        self.stalls: Deque[Stall] = deque(maxlen=capacity)
+        self.lags: Deque[float] = deque(maxlen=int(300 / interval))
+        self.max_lag: float = 0.0
+        self._last_beat: float = time.monotonic()
+        self._current: Optional[Stall] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task[None]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def __repr__(self) -> str:
+        return f"<LoopWatchdog stalls={len(self.stalls)} max_lag={self.max_lag:.3f}>"
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> asyncio.Task[None]:
+        """Starts watching the running loop, must be called from the loop's thread."""
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self.heartbeat())
+        self._thread = threading.Thread(target=self.watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        return self._task
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.record_lag(now - self._last_beat - self.interval)
+            self._last_beat = now
+
+    def record_lag(self, lag: float) -> None:
+        lag = max(0.0, lag)
+        self.lags.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+        current, self._current = self._current, None
+        if current is not None:
+            current.lag = lag
+
+    def watch(self) -> None:
+        while not self._stopped.wait(self.interval / 2):
+            late = time.monotonic() - self._last_beat - self.interval
+            if late > self.threshold and self._current is None:
+                self.sample(late)
+
+    def sample(self, lag: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread)  # type: ignore
+        if frame is None:
+            return
+        stall = Stall(discord.utils.utcnow(), lag, traceback.format_stack(frame))
+        self.stalls.append(stall)
+        self._current = stall
+
+    def percentile(self, percent: float) -> float:
+        if not self.lags:
+            return 0.0
+        ordered = sorted(self.lags)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent))]